@@ -15,11 +15,17 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+from . import _cache as cache
 from . import _node as node
+from . import _store as store
 from . import _package_manager as package_manager
+from . import _scheduler as scheduler
+from . import _discovery as discovery
+from . import _sourcemap as sourcemap
 from . import _runner as runner
 from . import _data as data
 from . import _tb as tb
+from . import _timing as timing
 from . import _unittest as unittest
 
 from ._setuptools import SetuptoolsLoader
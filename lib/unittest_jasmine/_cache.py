@@ -0,0 +1,161 @@
+# coding=utf-8
+# unittest-jasmine
+# Copyright (C) 2015 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+This module manages the directory used to store data between test runs.
+
+The cache directory is read from the environment variable
+``UNITTEST_JASMINE_CACHE``. If that is not set, the directory
+``unittest-jasmine`` in ``$XDG_CACHE_HOME``, or ``~/.cache`` if that is not
+set either, is used.
+
+Failing to write to the cache is never an error; the data is simply not
+persisted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+
+log = logging.getLogger(__name__)
+
+
+#: The environment variable used to override the cache directory
+ENVIRONMENT_VARIABLE = 'UNITTEST_JASMINE_CACHE'
+
+
+def directory(*parts):
+    """Returns the path to a directory in the cache, creating it if it does not
+    exist.
+
+    :param [str] parts: The path components of the directory, relative to the
+        cache root.
+
+    :return: the absolute path of the directory
+    :rtype: str
+    """
+    root = os.environ.get(ENVIRONMENT_VARIABLE) or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(
+            os.path.expanduser('~'), '.cache'),
+        'unittest-jasmine')
+    path = os.path.abspath(os.path.join(root, *parts))
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            log.warning('Failed to create cache directory %s', path)
+    return path
+
+
+def key(*values):
+    """Generates a cache key from a sequence of *JSON* serialisable values.
+
+    :param values: The values identifying the cache entry.
+
+    :return: a string suitable for use as a file name
+    :rtype: str
+    """
+    return hashlib.sha1(
+        json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def identity(command):
+    """Identifies the executable run by a command.
+
+    The identity changes when the executable found on ``PATH`` is replaced or
+    modified.
+
+    :param str command: The command.
+
+    :return: the tuple ``(path, inode, mtime)`` of the executable, with any
+        symbolic links resolved, or ``None`` if it is not found
+    :rtype: tuple or None
+    """
+    location = shutil.which(command)
+    if location is None:
+        return None
+    try:
+        real_path = os.path.realpath(location)
+        stat = os.stat(real_path)
+        return (real_path, stat.st_ino, stat.st_mtime)
+    except OSError:
+        return None
+
+
+def command_key(commands, *values):
+    """Generates a cache key from the executables run by a sequence of
+    commands.
+
+    The key depends on ``PATH`` and on the :func:`identity` of every command,
+    so it changes when any command would run a different executable.
+
+    :param [str] commands: The commands.
+
+    :param values: Additional values identifying the cache entry.
+
+    :return: a string suitable for use as a file name
+    :rtype: str
+    """
+    return key(
+        os.environ.get('PATH', ''),
+        [identity(command) for command in commands],
+        *values)
+
+
+def load(path, default=None):
+    """Loads a *JSON* value from the cache.
+
+    :param str path: The path of the cache file.
+
+    :param default: The value to return if the file does not exist or is
+        invalid.
+
+    :return: the cached value, or ``default``
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return default
+
+
+def store(path, value):
+    """Stores a *JSON* value in the cache.
+
+    The file is replaced atomically, so concurrent readers never see a partial
+    value.
+
+    :param str path: The path of the cache file.
+
+    :param value: The value to store.
+    """
+    try:
+        fd, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(path),
+            prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+            os.replace(temporary, path)
+        except:
+            os.unlink(temporary)
+            raise
+    except (IOError, OSError):
+        log.warning('Failed to write cache file %s', path, exc_info=True)
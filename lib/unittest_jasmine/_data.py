@@ -16,22 +16,47 @@
 # this program. If not, see <http://www.gnu.org/licenses/>.
 """
 This module contains classes representing the items of a test suite tree, as
-returned by the first line output by ``runner.js``.
+returned by the first event output by ``runner.js``.
 
-Use :func:`parse` to convert the first line to a structured representation of
+Use :func:`parse` to convert the first event to a structured representation of
 the tests.
+
+If the test tree is streamed, the children of suites are not included in the
+first event, but announced with the ``suiteStarted`` event of the suite. Such
+suites are *pending* until they have been started.
+
+The events of a run are normally read in the order of the test tree. If the
+runner may emit them in any other order, wrap the event stream in a
+:class:`Router` before passing it to :meth:`JasmineData.running`.
 """
 
 import contextlib
+import sys
 
 
 class JasmineData(object):
     """The base class for *Jasmine* specs and suites.
+
+    To keep large test trees small, instances have no ``__dict__``, the
+    descriptions, which are often repeated, are interned and only the fields of
+    the *done* event listed in :attr:`RESULT_FIELDS` are kept in
+    :attr:`result`.
     """
+    __slots__ = ('_id', '_name', '_description', '_result')
+
+    #: The fields of the data of the *done* event to keep in :attr:`result`;
+    #: the value is either ``None``, to keep the field as is, or a tuple of
+    #: field names to keep from every item of a list value
+    RESULT_FIELDS = {
+        'status': None,
+        'failedExpectations': ('message', 'stack'),
+        'output': None,
+        'duration': None}
+
     def __init__(self, id, name, description):
         self._id = id
         self._name = name
-        self._description = description
+        self._description = sys.intern(description)
         self._result = {}
 
     def __eq__(self, other):
@@ -75,13 +100,61 @@ class JasmineData(object):
         """
         @contextlib.contextmanager
         def context():
-            self.verify_started(next(jasmine))
+            started = self._receive(jasmine, self.TYPE + 'Started')
+            self.verify_started(started)
+            self._started(started['data'])
             yield self
-            result = next(jasmine)
+            result = self._receive(jasmine, self.TYPE + 'Done')
             self.verify_done(result)
-            self._result = result
+            self._result = self._trim(result)
         return context()
 
+    def _receive(self, jasmine, event):
+        """Reads the next event for this item.
+
+        :param jasmine: The event stream. If this is a :class:`Router`, the
+            event is looked up by name and :attr:`id`, otherwise the next event
+            is read.
+
+        :param str event: The name of the expected event.
+
+        :return: the event object
+        """
+        if isinstance(jasmine, Router):
+            return jasmine.receive(event, self.id)
+        else:
+            return next(jasmine)
+
+    def _trim(self, result):
+        """Removes the fields not listed in :attr:`RESULT_FIELDS` from the
+        data of a *done* event.
+
+        :param dict result: The *done* event.
+
+        :return: a trimmed copy of ``result``
+        """
+        data = result['data']
+        trimmed = {}
+        for key, fields in self.RESULT_FIELDS.items():
+            if key not in data:
+                continue
+            elif fields is None:
+                trimmed[key] = data[key]
+            else:
+                trimmed[key] = [
+                    dict((f, item[f]) for f in fields if f in item)
+                    for item in data[key]]
+        return {
+            'event': result['event'],
+            'data': trimmed}
+
+    def _started(self, data):
+        """Called when the *started* event has been verified.
+
+        :param dict data: The data of the event.
+        """
+        pass
+
     def _verify(self, expected_event, actual_event, data):
         """Verifies that and event is of the expected type, and that the
         ``'id'`` field of ``data`` equals :attr:`id`.
@@ -127,15 +200,26 @@ class JasmineData(object):
 class JasmineSpec(JasmineData):
     """A *Jasmine* test spec.
     """
+    __slots__ = ()
+
     TYPE = 'spec'
 
 
 class JasmineSuite(JasmineData):
+    """A *Jasmine* test suite.
+
+    If ``children`` is callable, the suite is pending. The callable is called
+    with the list of child items announced when the suite is started, and must
+    return the actual children.
+    """
+    __slots__ = ('_children', '_index')
+
     TYPE = 'suite'
 
     def __init__(self, children, *args, **kwargs):
         super(JasmineSuite, self).__init__(*args, **kwargs)
         self._children = children
+        self._index = None
 
     def __eq__(self, other):
         return super(JasmineSuite, self).__eq__(other) \
@@ -143,9 +227,53 @@ class JasmineSuite(JasmineData):
 
     @property
     def children(self):
-        """The suite child items; this is a sequence of specs and suites."""
+        """The suite child items; this is a sequence of specs and suites. This
+        is empty while the suite is pending."""
+        return [] if self.pending else self._children
+
+    @property
+    def pending(self):
+        """Whether the children of this suite have not yet been announced"""
+        return callable(self._children)
+
+    def find(self, id):
+        """Finds an item in the tree below this suite.
+
+        For the top level suite returned by :func:`parse`, this is a lookup in
+        an index kept up to date as pending suites are announced; for other
+        suites the tree is searched.
+
+        :param str id: The ID of the item.
+
+        :return: the item, or ``None`` if it is not found
+        """
+        if self._index is not None:
+            return self._index.get(id)
+
+        for child in self.children:
+            if child.id == id:
+                return child
+            elif isinstance(child, JasmineSuite):
+                item = child.find(id)
+                if item is not None:
+                    return item
+
+    def announce(self, items):
+        """Creates the children of a pending suite.
+
+        :param [dict] items: The child items, as announced by the runner.
+
+        :return: the children
+        """
+        self._children = self._children(items)
         return self._children
 
+    def _started(self, data):
+        if self.pending:
+            if 'children' not in data:
+                raise RuntimeError('no children announced for %s' % self.id)
+            self.announce(data['children'])
+
 
 def parse(item, spec=JasmineSpec, suite=JasmineSuite, **kwargs):
     """Parses a ``dict`` into a suite or a spec.
@@ -161,26 +289,49 @@ def parse(item, spec=JasmineSpec, suite=JasmineSuite, **kwargs):
     :param kwargs: Any keyword arguments to pass to the spec and suite
         generating functions.
 
+    If a suite item does not have the key ``'children'``, the suite is created
+    pending, and its children are parsed once they are announced.
+
+    If the returned item is a suite, it keeps an index of all items in the tree
+    by ID; see :meth:`JasmineSuite.find`.
+
     :raises ValueError: if ``item['type']`` is invalid
 
     :raises KeyError: if a required value if missing from ``item``
     """
+    index = {}
+    result = _parse(item, spec, suite, index, kwargs)
+    if isinstance(result, JasmineSuite):
+        result._index = index
+    return result
+
+
+def _parse(item, spec, suite, index, kwargs):
+    """Parses a ``dict`` into a suite or a spec, and adds all created items to
+    an index.
+
+    :param dict index: The index mapping item IDs to items.
+
+    See :func:`parse` for a description of the other parameters.
+    """
     item_type = item['type']
     item_id = item['id']
     item_name = item['fullName']
     item_description = item['description']
 
     if item_type == JasmineSpec.TYPE:
-        return spec(
+        result = spec(
             item_id,
             item_name,
             item_description,
             **kwargs)
 
     elif item_type == JasmineSuite.TYPE:
-        item_children = item['children']
-        return suite(
-            [parse(i, spec, suite, **kwargs) for i in item_children],
+        def children(items):
+            return [_parse(i, spec, suite, index, kwargs) for i in items]
+
+        result = suite(
+            children(item['children']) if 'children' in item else children,
             item_id,
             item_name,
             item_description,
@@ -188,3 +339,82 @@ def parse(item, spec=JasmineSpec, suite=JasmineSuite, **kwargs):
 
     else:
         raise ValueError('unknown type: %s', item_type)
+
+    index[result.id] = result
+    return result
+
+
+class Router(object):
+    """Dispatches the events of a run to the test items to which they belong.
+
+    Test items read their events from a router in the order of the test tree,
+    regardless of the order in which the runner emits them. Events read ahead
+    of the item to which they belong are kept until requested.
+
+    :param events: The event stream, not including the test tree.
+
+    :param JasmineSuite tree: The top level suite, as returned by
+        :func:`parse`. If this is passed, events for unknown items are
+        rejected, and pending suites are announced as soon as their
+        *started* events are read, so that events for their children are
+        recognised.
+    """
+    def __init__(self, events, tree=None):
+        self._events = iter(events)
+        self._tree = tree
+        self._pending = {}
+
+    @property
+    def pending(self):
+        """The number of events read ahead and not yet requested"""
+        return len(self._pending)
+
+    def receive(self, event, id):
+        """Reads the event with a specific name for a specific item.
+
+        :param str event: The name of the event.
+
+        :param str id: The ID of the item.
+
+        :return: the event object
+
+        :raises RuntimeError: if the event is not found in the stream, or if an
+            invalid event is read
+        """
+        key = (event, id)
+        if key in self._pending:
+            return self._pending.pop(key)
+
+        for o in self._events:
+            data = o.get('data')
+            if not data:
+                raise RuntimeError('no event data provided')
+            other = (o.get('event'), data.get('id'))
+            if other == key:
+                return o
+
+            self._keep(other, o)
+
+        raise RuntimeError(
+            'expected event %s for %s, found end of stream' % key)
+
+    def _keep(self, key, o):
+        """Keeps an event read ahead of the item to which it belongs.
+
+        :param tuple key: The tuple ``(event, id)``.
+
+        :param dict o: The event object.
+
+        :raises RuntimeError: if the event is invalid
+        """
+        if key in self._pending:
+            raise RuntimeError('duplicate event %s for %s' % key)
+
+        if self._tree is not None:
+            item = self._tree.find(key[1])
+            if item is None:
+                raise RuntimeError('event %s for unknown item %s' % key)
+            elif key[0] == item.TYPE + 'Started':
+                item._started(o['data'])
+
+        self._pending[key] = o
@@ -0,0 +1,217 @@
+# coding=utf-8
+# unittest-jasmine
+# Copyright (C) 2015 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+This module finds spec files in a directory tree.
+
+Files are selected using glob patterns matched against their paths relative to
+the root directory, using ``/`` as separator. In a pattern, ``*`` and ``?``
+do not match ``/``, while ``**`` matches any number of directories.
+
+The listings of the directories, and the files selected from them, are stored
+in the cache, and reused as long as the modification time of the directory and
+the patterns are unchanged, so only one ``stat`` call per directory is made
+when nothing has changed. Directories in which no include pattern can match are
+not searched at all.
+"""
+
+import os
+import re
+import time
+
+from . import cache
+
+
+#: The default patterns of files to include
+INCLUDE = ('**',)
+
+#: The default patterns of files and directories to exclude; these are
+#: ``node_modules`` directories and hidden files and directories
+EXCLUDE = ('**/node_modules', '**/.*')
+
+#: Listings of directories modified more recently than this many seconds ago
+#: are not cached, since the modification time may not change if they are
+#: modified again within the resolution of the file system timestamps
+RACY_INTERVAL = 2.0
+
+
+def find(directory, include=None, exclude=None):
+    """Finds all files in a directory tree matching glob patterns.
+
+    :param str directory: The root directory.
+
+    :param [str] include: The patterns of files to include. If this is not
+        specified, :attr:`INCLUDE` is used.
+
+    :param [str] exclude: The patterns of files and directories to exclude;
+        excluded directories are not searched. If this is not specified,
+        :attr:`EXCLUDE` is used.
+
+    :return: the paths of the files found, relative to ``directory`` and
+        sorted
+    :rtype: [str]
+    """
+    include = list(INCLUDE if include is None else include)
+    exclude = list(EXCLUDE if exclude is None else exclude)
+    included = _compile(include)
+    excluded = _compile(exclude)
+    searched = _compile(_prefixes(include))
+
+    path = os.path.join(
+        cache.directory('discovery'),
+        cache.key(os.path.abspath(directory)) + '.json')
+    cached = cache.load(path, {})
+    if cached.get('patterns') != [include, exclude]:
+        cached = {}
+    listings = cached.get('listings', {})
+    updated = {}
+
+    result = []
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        previous = listings.get(relative)
+        listing = _list(os.path.join(directory, relative), previous)
+        if listing is None:
+            continue
+
+        mtime, directories, files = listing[:3]
+        for name in directories:
+            child = relative + '/' + name if relative else name
+            if searched.match(child) and not excluded.match(child):
+                pending.append(child)
+
+        # The selected files are stored last in the listing
+        if listing is not previous:
+            prefix = relative + '/' if relative else ''
+            listing.append([
+                name
+                for name in files
+                if included.match(prefix + name)
+                and not excluded.match(prefix + name)])
+        updated[relative] = listing
+        result.extend(
+            relative + '/' + name if relative else name
+            for name in listing[3])
+
+    if updated != listings:
+        cache.store(path, {
+            'patterns': [include, exclude],
+            'listings': updated})
+
+    return sorted(result)
+
+
+def _list(directory, cached):
+    """Lists a directory.
+
+    :param str directory: The directory to list.
+
+    :param list cached: The cached listing of the directory, or ``None``.
+
+    :return: the listing ``[mtime, directories, files]``, where ``mtime`` is
+        ``None`` if the listing must not be reused, or ``None`` if the
+        directory cannot be read
+    """
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+    if cached is not None and cached[0] == mtime:
+        return cached
+
+    directories = []
+    files = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+    except OSError:
+        return None
+
+    if time.time() - mtime / 1e9 < RACY_INTERVAL:
+        mtime = None
+    return [mtime, sorted(directories), sorted(files)]
+
+
+def _prefixes(patterns):
+    """Generates glob patterns matching the directories that may contain files
+    matched by a sequence of glob patterns.
+
+    A pattern matches files below the directories matched by the leading path
+    components of the pattern. Once a component contains ``**``, any deeper
+    directory may contain matching files as well, which the translated prefix
+    already matches.
+
+    :param [str] patterns: The glob patterns of files.
+
+    :return: the glob patterns of directories
+    :rtype: [str]
+    """
+    result = []
+    for pattern in patterns:
+        parts = pattern.split('/')
+        for i, part in enumerate(parts):
+            if i < len(parts) - 1 or '**' in part:
+                result.append('/'.join(parts[:i + 1]))
+            if '**' in part:
+                break
+    return result
+
+
+def _compile(patterns):
+    """Compiles a sequence of glob patterns to a single regular expression.
+
+    :param [str] patterns: The glob patterns.
+
+    :return: a compiled regular expression matching a path if any pattern
+        matches it
+    """
+    return re.compile('|'.join(
+        '(?:%s)\\Z' % _translate(pattern)
+        for pattern in patterns) or '(?!)')
+
+
+def _translate(pattern):
+    """Translates a glob pattern to a regular expression.
+
+    :param str pattern: The glob pattern.
+
+    :return: a regular expression
+    :rtype: str
+    """
+    result = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            result.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            result.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            result.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            result.append('[^/]')
+            i += 1
+        else:
+            result.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(result)
@@ -22,11 +22,51 @@ Since node.js picked an already used binary name, we must check whether
 ``node`` is *node.js* or *node - Amateur Packet Radio Node program*. The latter
 is the case on some *Debian* based systems.
 
-If no suitable executable is found, ``ImportError`` is raised.
+The command is located the first time it is needed, and not when this module
+is imported. Set the environment variable ``UNITTEST_JASMINE_NODE`` to skip
+the detection and use a specific command. Otherwise the result of the
+detection is stored in the cache, keyed by ``PATH`` and the identities of the
+candidate executables, so it is only repeated when any of them changes.
+
+If no suitable executable is found, ``ImportError`` is raised when the command
+is first needed.
 """
 
+import os
 import subprocess
 
+from . import cache
+
+
+#: The environment variable used to override the command used to launch
+#: ``node``
+ENVIRONMENT_VARIABLE = 'UNITTEST_JASMINE_NODE'
+
+#: The commands that may launch ``node``, in order of preference
+CANDIDATES = ('node', 'nodejs')
+
+#: The located command; this is set by :func:`binary`
+_binary = None
+
+
+def binary():
+    """Returns the command used to launch ``node``.
+
+    The command is located on the first call.
+
+    :return: the command
+
+    :rtype: str
+
+    :raises ImportError: if ``node`` is not available
+    """
+    global _binary
+    if _binary is None:
+        _binary = _locate_node()
+        if _binary is None:
+            raise ImportError('node is not available')
+    return _binary
+
 
 def run(command, *args, **kwargs):
     """Calls ``node`` using :class:`subprocess.Popen` with the arguments given.
@@ -38,7 +78,7 @@ def run(command, *args, **kwargs):
     :class:`~subprocess.Popen` constructor, and ``*args`` and ``**kwargs`` are
     simply passed on. It returns the value returned by the constructor.
     """
-    return subprocess.Popen([BINARY] + command, *args, **kwargs)
+    return subprocess.Popen([binary()] + command, *args, **kwargs)
 
 
 def _locate_node():
@@ -46,19 +86,58 @@ def _locate_node():
 
     :return: the command to use, or ``None`` if ``node`` is not installed
 
+    :rtype: str or None
+    """
+    override = os.environ.get(ENVIRONMENT_VARIABLE)
+    if override:
+        return override
+
+    path = os.path.join(cache.directory(), 'node.json')
+    key = _cache_key()
+    entries = cache.load(path, {})
+    if key in entries:
+        return entries[key]
+
+    node = _probe()
+    if node is not None:
+        entries[key] = node
+        cache.store(path, entries)
+    return node
+
+
+def _cache_key():
+    """Generates the key identifying the current set of candidate executables.
+
+    :return: a cache key
+    :rtype: str
+    """
+    return cache.command_key(CANDIDATES)
+
+
+def _probe():
+    """Determines the command to use to invoke ``node`` by running the
+    candidates.
+
+    :return: the command to use, or ``None`` if ``node`` is not installed
+
     :rtype: str or None
     """
     # Since node.js picked an already used binary name, we must check whether
     # `node` is node.js or node - Amateur Packet Radio Node program
-    for node in ('node', 'nodejs'):
+    for node in CANDIDATES:
         try:
             node_output = subprocess.check_output([
                 node, '--eval', 'console.log("%s")' % __name__])
             if node_output.strip().decode('ascii') == __name__:
                 return node
-        except OSError:
+        except (OSError, subprocess.CalledProcessError):
             pass
 
-BINARY = _locate_node()
-if BINARY is None:
-    raise ImportError('node is not available')
+
+def __getattr__(name):
+    # BINARY used to be located when this module was imported; keep it
+    # available, but locate the command lazily
+    if name == 'BINARY':
+        return binary()
+    raise AttributeError(
+        'module %s has no attribute %s' % (__name__, name))
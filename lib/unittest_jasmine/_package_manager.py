@@ -17,16 +17,45 @@
 """
 This module handles installation of dependencies for *JavaScript*.
 
-Currently, the only supported package manager is ``npm``.
+The supported package managers are ``pnpm``, ``yarn`` and ``npm``. The package
+manager is chosen by the lock file present in the package directory:
+``pnpm-lock.yaml`` selects :class:`PNPM`, ``yarn.lock`` selects :class:`Yarn`
+and ``package-lock.json`` or ``npm-shrinkwrap.json`` selects :class:`NPMCI`.
+Without a lock file, :class:`NPM` is used.
 
 To add other package managers, use the :func:`register` decorator on a class
-with an argument-less constructor and which implements the
-:meth:`~NPM.install_dependencies` method.
+with a constructor accepting the absolute path of the package directory and
+which implements the :meth:`~PackageManager.install_dependencies` method. The
+package directory must be used instead of the current directory, since
+dependencies may be installed in a background thread while the current
+directory is changed.
+
+If the content-addressed store is enabled, :class:`Store` takes precedence,
+and installs dependencies using one of the other package managers only once
+for every set of dependencies; see :mod:`unittest_jasmine.store`.
+
+Use :class:`Installation` to install dependencies in a background thread while
+doing other work.
+
+Once dependencies have been installed, a stamp identifying the dependency files
+and the installed modules is stored in the cache, and the installation is
+skipped until either changes.
+
+The versions of the package manager commands are stored in the cache as well,
+keyed by ``PATH`` and the identity of the executable, so choosing a package
+manager does not launch any process unless a command has changed.
 """
 
+import hashlib
 import logging
 import os
+import platform
+import re
 import subprocess
+import sys
+import threading
+
+from . import cache, node, store
 
 
 log = logging.getLogger(
@@ -35,6 +64,9 @@ log = logging.getLogger(
 
 PACKAGE_MANAGERS = []
 
+#: The versions of commands already determined by this process
+_versions = {}
+
 
 def register(klass):
     """A decorator to register a class as a package manager.
@@ -49,76 +81,459 @@ def register(klass):
     return klass
 
 
-@register
-class NPM(object):
-    """A class to manage and detect ``npm``.
+def version(command, directory=None):
+    """Determines the version of a command by running it with the argument
+    ``--version``.
+
+    The version is determined once per process, and is stored in the cache,
+    keyed by :func:`unittest_jasmine.cache.command_key`.
+
+    :param str command: The command.
+
+    :param str directory: The directory in which to run the command. If this
+        is not specified, the current directory is used.
+
+    :return: the version, or ``None`` if the command is not available
+    :rtype: tuple(int) or None
+
+    :raises ValueError: if the version cannot be parsed
     """
-    #: The command used to launch ``npm``
-    COMMAND = 'npm'
+    if command in _versions:
+        return _versions[command]
+
+    if cache.identity(command) is None:
+        _versions[command] = None
+        return None
+
+    key = cache.command_key([command])
+    path = os.path.join(cache.directory(), 'package-managers.json')
+    entries = cache.load(path, {})
+    if key in entries:
+        result = tuple(entries[key])
+
+    else:
+        output = subprocess.check_output(
+            [command, '--version'],
+            cwd=directory,
+            stderr=subprocess.STDOUT).strip().decode('ascii')
+        match = re.match(r'v?(\d+(?:\.\d+)*)', output)
+        if match is None:
+            raise ValueError('invalid version: %s' % output)
+        result = tuple(int(p) for p in match.group(1).split('.'))
+        entries[key] = result
+        cache.store(path, entries)
+
+    _versions[command] = result
+    return result
 
-    #: The files used by ``npm`` to specify dependencies
+
+class PackageManager(object):
+    """The base class for package managers launching a command to install
+    dependencies.
+
+    Subclasses must set :attr:`COMMAND` and :attr:`INSTALL_ARGUMENTS`.
+
+    :param str directory: The package directory. If this is not specified, the
+        current directory is used.
+
+    :raises ValueError: if the directory is not a package directory, if a
+        required lock file is missing or if the command is not available
+    """
+    #: The command used to launch the package manager
+    COMMAND = None
+
+    #: The argument lists with which to launch :attr:`COMMAND` to install
+    #: dependencies; if launching it fails, the next list is tried
+    INSTALL_ARGUMENTS = ()
+
+    #: The oldest version of :attr:`COMMAND` supporting
+    #: :attr:`INSTALL_ARGUMENTS`
+    MINIMUM_VERSION = ()
+
+    #: The files used to specify dependencies
     DEPENDENCY_FILES = (
-        'package.json',
-        'npm-shrinkwrap.json')
+        'package.json',)
 
-    log = logging.getLogger(
-        '.'.join((__name__, 'npm')))
+    #: The lock files of which one must be present for this package manager to
+    #: be used; if this is empty, no lock file is required
+    LOCK_FILES = ()
+
+    #: The directory into which dependencies are installed
+    MODULES_DIRECTORY = 'node_modules'
+
+    #: The file in :attr:`MODULES_DIRECTORY` in which the package manager
+    #: records the installed packages
+    MODULES_LOCK_FILE = None
+
+    log = log
+
+    def __init__(self, directory=None):
+        #: The absolute path of the package directory
+        self.directory = os.path.abspath(directory or os.getcwd())
 
-    def __init__(self):
         if not any(
-                os.path.isfile(dependency_file)
+                os.path.isfile(self.path(dependency_file))
                 for dependency_file in self.DEPENDENCY_FILES):
-            self.log.warn('Not npm package directory: %s', os.getcwd())
-            raise ValueError('invalid current working directory')
+            raise ValueError('not %s package directory: %s' % (
+                self.COMMAND, self.directory))
 
-        try:
-            output = subprocess.check_output(
-                [self.COMMAND, '--version'],
-                stderr=subprocess.STDOUT).strip().decode('ascii')
-        except:
-            self.log.exception('Failed to get npm version')
-            raise
+        if self.LOCK_FILES and not any(
+                os.path.isfile(self.path(lock_file))
+                for lock_file in self.LOCK_FILES):
+            raise ValueError('no lock file for %s' % self.COMMAND)
 
         try:
-            self.version = tuple(int(p) for p in output.split('.'))
-            self.log.debug('Using npm version %s', '.'.join(
-                str(p) for p in self.version))
+            self.version = version(self.COMMAND, self.directory)
         except:
-            self.log.exception('Failed to parse npm version %s', output)
+            self.log.exception('Failed to get %s version', self.COMMAND)
             raise
+        if self.version is None:
+            raise ValueError('%s is not available' % self.COMMAND)
+
+        self.log.debug('Using %s version %s', self.COMMAND, '.'.join(
+            str(p) for p in self.version))
+        if self.version < self.MINIMUM_VERSION:
+            raise ValueError('%s version %s is not supported' % (
+                self.COMMAND, '.'.join(str(p) for p in self.version)))
 
     def install_dependencies(self):
         """Installs dependencies.
 
-        This method will simply execute the command ``npm install`` using
-        :func:`subprocess.check_call`. Any exceptions raised by that call will
-        be re-raised.
+        This method will execute :attr:`COMMAND` using
+        :func:`subprocess.check_call`, unless the stamp stored after the last
+        successful installation still matches :meth:`stamp`. Any exceptions
+        raised by the last attempt will be re-raised.
         """
+        path = os.path.join(
+            cache.directory('install'),
+            cache.key(self.__class__.__name__, self.directory) + '.json')
+        if cache.load(path) == self.stamp():
+            self.log.info('Dependencies are up to date')
+            return
+
         self.log.info('Installing dependencies')
         try:
-            subprocess.check_output(
-                [self.COMMAND, 'install'],
-                stderr=subprocess.STDOUT)
+            self._install()
         except:
-            self.log.exception('Failed to install packages using npm')
+            self.log.exception(
+                'Failed to install packages using %s', self.COMMAND)
             raise
 
+        cache.store(path, self.stamp())
+
+    def path(self, *parts):
+        """Returns the absolute path of a file in the package directory.
+
+        :param [str] parts: The path components, relative to the package
+            directory.
+
+        :return: an absolute path
+        :rtype: str
+        """
+        return os.path.join(self.directory, *parts)
+
+    def stamp(self):
+        """Identifies the current dependency files and installed modules.
+
+        The stamp contains the content hashes of :attr:`DEPENDENCY_FILES` and
+        :attr:`MODULES_LOCK_FILE`, and the names of the packages in
+        :attr:`MODULES_DIRECTORY`. The installed packages are not read, so
+        modifications inside a package are not detected.
+
+        :return: the stamp
+        :rtype: dict
+        """
+        def digest(path):
+            try:
+                with open(path, 'rb') as f:
+                    return hashlib.sha1(f.read()).hexdigest()
+            except (IOError, OSError):
+                return None
+
+        try:
+            modules = sorted(os.listdir(self.path(self.MODULES_DIRECTORY)))
+        except OSError:
+            modules = None
+
+        if self.MODULES_LOCK_FILE:
+            lock = digest(self.path(
+                self.MODULES_DIRECTORY, self.MODULES_LOCK_FILE))
+        else:
+            lock = None
+
+        return {
+            'files': dict(
+                (dependency_file, digest(self.path(dependency_file)))
+                for dependency_file in self.DEPENDENCY_FILES),
+            'modules': modules,
+            'lock': lock}
+
+    def _install(self):
+        """Executes the command installing dependencies.
+
+        Every list of :attr:`INSTALL_ARGUMENTS` is tried until one succeeds.
+        """
+        for i, arguments in enumerate(self.INSTALL_ARGUMENTS):
+            try:
+                subprocess.check_output(
+                    [self.COMMAND] + list(arguments),
+                    cwd=self.directory,
+                    stderr=subprocess.STDOUT)
+                return
+            except subprocess.CalledProcessError:
+                if i == len(self.INSTALL_ARGUMENTS) - 1:
+                    raise
+                self.log.warning(
+                    'Failed to run %s %s, retrying',
+                    self.COMMAND, ' '.join(arguments))
 
-def install_dependencies():
+
+@register
+class NPM(PackageManager):
+    """A class to manage and detect ``npm``.
+    """
+    COMMAND = 'npm'
+
+    INSTALL_ARGUMENTS = (
+        ('install',),)
+
+    DEPENDENCY_FILES = (
+        'package.json',
+        'npm-shrinkwrap.json',
+        'package-lock.json')
+
+    MODULES_LOCK_FILE = '.package-lock.json'
+
+    log = logging.getLogger(
+        '.'.join((__name__, 'npm')))
+
+
+@register
+class NPMCI(NPM):
+    """A class to install the exact dependencies of a lock file using
+    ``npm ci``.
+    """
+    INSTALL_ARGUMENTS = (
+        ('ci',),)
+
+    MINIMUM_VERSION = (5, 7)
+
+    LOCK_FILES = (
+        'npm-shrinkwrap.json',
+        'package-lock.json')
+
+
+@register
+class Yarn(PackageManager):
+    """A class to manage and detect ``yarn``.
+
+    Dependencies are installed from the local cache if possible.
+    """
+    COMMAND = 'yarn'
+
+    INSTALL_ARGUMENTS = (
+        ('install', '--frozen-lockfile', '--offline'),
+        ('install', '--frozen-lockfile'))
+
+    DEPENDENCY_FILES = (
+        'package.json',
+        'yarn.lock')
+
+    LOCK_FILES = (
+        'yarn.lock',)
+
+    MODULES_LOCK_FILE = '.yarn-integrity'
+
+    log = logging.getLogger(
+        '.'.join((__name__, 'yarn')))
+
+
+@register
+class PNPM(PackageManager):
+    """A class to manage and detect ``pnpm``.
+
+    Dependencies are installed from the local store if possible.
+    """
+    COMMAND = 'pnpm'
+
+    INSTALL_ARGUMENTS = (
+        ('install', '--offline'),
+        ('install',))
+
+    DEPENDENCY_FILES = (
+        'package.json',
+        'pnpm-lock.yaml')
+
+    LOCK_FILES = (
+        'pnpm-lock.yaml',)
+
+    MODULES_LOCK_FILE = '.modules.yaml'
+
+    log = logging.getLogger(
+        '.'.join((__name__, 'pnpm')))
+
+
+@register
+class Store(PackageManager):
+    """A class installing dependencies from the content-addressed store.
+
+    The dependencies are installed by the first other applicable package
+    manager the first time, and the resulting tree is added to the store. Once
+    stored, the tree is materialised without running any package manager.
+
+    :param str directory: The package directory. If this is not specified, the
+        current directory is used.
+
+    :raises ValueError: if the store is not enabled, if no lock file is present
+        or if no other package manager is applicable
+    """
+    #: The lock files of which one must be present for the tree to be stored;
+    #: without a lock file, the installed tree is not reproducible
+    LOCK_FILES = (
+        'npm-shrinkwrap.json',
+        'package-lock.json',
+        'yarn.lock',
+        'pnpm-lock.yaml')
+
+    log = logging.getLogger(
+        '.'.join((__name__, 'store')))
+
+    def __init__(self, directory=None):
+        self.directory = os.path.abspath(directory or os.getcwd())
+
+        if not store.enabled():
+            raise ValueError('the store is not enabled')
+        if not any(
+                os.path.isfile(self.path(lock_file))
+                for lock_file in self.LOCK_FILES):
+            raise ValueError('no lock file for the store')
+
+        self.delegate = None
+        for package_manager_class in PACKAGE_MANAGERS:
+            if not issubclass(package_manager_class, PackageManager) \
+                    or issubclass(package_manager_class, Store):
+                continue
+            try:
+                self.delegate = package_manager_class(self.directory)
+                break
+            except Exception:
+                continue
+        if self.delegate is None:
+            raise ValueError('no package manager to use with the store')
+
+        self.COMMAND = self.delegate.COMMAND
+        self.DEPENDENCY_FILES = self.delegate.DEPENDENCY_FILES
+        self.MODULES_DIRECTORY = self.delegate.MODULES_DIRECTORY
+        self.MODULES_LOCK_FILE = self.delegate.MODULES_LOCK_FILE
+        self.version = self.delegate.version
+
+    def key(self):
+        """Identifies the dependency tree to install.
+
+        The key depends on the content of :attr:`DEPENDENCY_FILES`, the
+        package manager used to install the tree, the platform and the
+        ``node`` executable and its version, since packages may contain native
+        code.
+
+        :return: a cache key
+        :rtype: str
+        """
+        binary = node.binary()
+        identity = cache.identity(binary)
+        return cache.key(
+            self.delegate.__class__.__name__,
+            self.stamp()['files'],
+            sys.platform,
+            platform.machine(),
+            identity[0] if identity is not None else binary,
+            version(binary))
+
+    def _install(self):
+        key = self.key()
+        if not store.contains(key):
+            self.log.info('Adding dependencies to store')
+            self.delegate._install()
+            store.ingest(self.path(self.MODULES_DIRECTORY), key)
+        else:
+            self.log.info('Installing dependencies from store')
+            store.materialize(self.path(self.MODULES_DIRECTORY), key)
+
+
+def install_dependencies(directory=None):
     """Installs dependencies.
 
     This function will iterate over all installed package managers and try to
     use them to install dependencies. Once one is successful, no more will be
-    called.
+    called. Package managers raising :class:`ValueError` when created are not
+    applicable, and are skipped silently.
+
+    :param str directory: The package directory. If this is not specified, the
+        current directory is used.
 
     :return: the package manager that serviced the request
     """
+    directory = os.path.abspath(directory or os.getcwd())
     for package_manager_class in PACKAGE_MANAGERS:
         try:
-            package_manager = package_manager_class()
+            package_manager = package_manager_class(directory)
+        except ValueError as e:
+            log.debug(
+                'Package manager %s not used: %s',
+                package_manager_class.__name__, e)
+            continue
+        except:
+            log.exception(
+                'Package manager %s failed',
+                package_manager_class.__name__)
+            continue
+
+        try:
             package_manager.install_dependencies()
             return package_manager
         except:
             log.exception(
                 'Package manager %s failed',
                 package_manager_class.__name__)
+
+    log.warning('No package manager installed dependencies in %s', directory)
+
+
+class Installation(object):
+    """Installs dependencies using :func:`install_dependencies` in a background
+    thread.
+
+    The installation starts when this object is created. Call :meth:`wait`
+    before using the installed dependencies.
+
+    :param str directory: The package directory. If this is not specified, the
+        current directory at the time this object is created is used, even if
+        it is changed before the installation completes.
+    """
+    def __init__(self, directory=None):
+        #: The absolute path of the package directory
+        self.directory = os.path.abspath(directory or os.getcwd())
+
+        #: The package manager that serviced the request; this is set once the
+        #: installation has completed
+        self.package_manager = None
+
+        self._thread = threading.Thread(target=self._install)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def done(self):
+        """Whether the installation has completed"""
+        return not self._thread.is_alive()
+
+    def wait(self):
+        """Waits for the installation to complete.
+
+        :return: the package manager that serviced the request, or ``None`` if
+            no package manager succeeded
+        """
+        self._thread.join()
+        return self.package_manager
+
+    def _install(self):
+        self.package_manager = install_dependencies(self.directory)
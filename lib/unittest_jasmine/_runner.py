@@ -18,13 +18,19 @@
 This module provides a generator that yields events from a *Jasmine* test run.
 """
 
+import asyncio
 import json
 import logging
+import multiprocessing
 import os
 import pkg_resources
+import queue
+import struct
 import subprocess
+import threading
+import time
 
-from . import node
+from . import cache, node, scheduler, sourcemap
 
 
 log = logging.getLogger(__name__)
@@ -33,6 +39,22 @@ log = logging.getLogger(__name__)
 #: The name of the runner *JavaScript*
 RUNNER_NAME = 'runner.js'
 
+#: The environment variable telling the runner the file descriptor to which to
+#: write events
+EVENT_FD_VARIABLE = 'UNITTEST_JASMINE_EVENT_FD'
+
+#: Whether the event channel is a pipe inherited by the runner; file
+#: descriptors cannot be passed to child processes on Windows, so there the
+#: runner writes events to ``stdout`` instead
+SEPARATE_CHANNEL = os.name != 'nt'
+
+#: The header of an event frame: the payload length
+FRAME_HEADER = struct.Struct('>I')
+
+#: The key of the events holding the value of :func:`time.perf_counter` when
+#: the event was received from the runner
+RECEIVED_KEY = 'received'
+
 
 def jasmine(project_dir, *files, **options):
     """Generates events from a test run.
@@ -44,6 +66,53 @@ def jasmine(project_dir, *files, **options):
     the data to their data argument. Please see ``./runner.js`` and the
     *Jasmine* documentation and source code for more information.
 
+    If the option ``workers`` is greater than ``1``, the spec files are split
+    into that many shards, each of which is run by a separate ``node``
+    process. The spec files are distributed by
+    :func:`unittest_jasmine.scheduler.schedule` using the durations recorded
+    from earlier runs, so the order of the top level suites may differ from
+    that of ``files``. The test trees and event streams of the shards are
+    merged, so the events generated are indistinguishable from those of a
+    serial run, except for the item IDs, which are prefixed with the shard
+    index. A value less than ``1`` means one worker per CPU.
+
+    If the option ``pool`` is a :class:`Pool`, the runs are served by its
+    processes instead of by newly started ones.
+
+    If the option ``pipeline`` is greater than ``0``, the events are read and
+    parsed by a background thread, which keeps at most that many events ahead
+    of the consumer; see :class:`Pipeline`.
+
+    If the option ``stream`` is ``True``, the first event contains only the
+    top level items of the test tree, and suites without the key
+    ``'children'`` instead have their children sent with the ``data`` of their
+    ``suiteStarted`` event. This allows the first result to be generated
+    without waiting for the entire test tree.
+
+    If the option ``filter`` is set, only the specs it selects are run, and
+    the other specs are never executed. The test tree contains only those
+    specs and the suites containing them. The durations of filtered runs are
+    not recorded. The filter is either a *JavaScript* regular expression,
+    matched against the full names of specs, or a ``dict`` with any of the
+    following keys; a spec must match every criterion present:
+
+    ``'pattern'``
+        A *JavaScript* regular expression matched against the full names of
+        specs.
+
+    ``'ids'``
+        A list of item IDs, as found in the test tree of an earlier,
+        identical run. Specs with a listed ID, or contained in a suite with a
+        listed ID, are selected. Since the spec files are distributed between
+        workers using the durations recorded, which change with every run,
+        IDs cannot be used with more than one worker.
+
+    ``'locations'``
+        A list of locations on the form ``'file:line'``, where ``file`` is
+        relative to the spec directory. Every location selects the item
+        defined closest before ``line`` in ``file``, and, if it is a suite,
+        all its specs.
+
     :param str project_dir: The base project directory. This can be set to
         either the base directory of the project, or the actual path to the
         spec files. If set to the project directory, ``options`` must contain
@@ -55,38 +124,810 @@ def jasmine(project_dir, *files, **options):
     :param options: Any configuration options passed to *Jasmine*. This value
         is sent to ``Jasmine.loadConfig``.
     """
+    pool = options.pop('pool', None)
+    start = pool._start if pool is not None else _start
+    pipeline = options.pop('pipeline', 0)
+
+    timings, requests = _prepare(project_dir, files, options)
+    record = timings.record if not requests[0]['filter'] else iter
+    if len(requests) > 1:
+        events = record(_merge([
+            start(request)
+            for request in requests]))
+    else:
+        events = record(start(requests[0])[0])
+
+    return Pipeline(events, pipeline) if pipeline > 0 else events
+
+
+async def jasmine_async(project_dir, *files, **options):
+    """Asynchronously generates events from a test run.
+
+    This is the :mod:`asyncio` counterpart of :func:`jasmine`, and it accepts
+    the same arguments, except for ``pool`` and ``pipeline``. The runner
+    processes are started using :func:`asyncio.create_subprocess_exec`, so any
+    number of runs may be consumed concurrently from the same event loop.
+
+    The runner processes are started when the first event is requested, and
+    killed if the generator is closed before it is exhausted.
+
+    :raises TypeError: if the option ``pool`` or ``pipeline`` is passed
+    """
+    for name in ('pool', 'pipeline'):
+        if name in options:
+            raise TypeError(
+                'the option %s is not supported by jasmine_async' % name)
+
+    timings, requests = _prepare(project_dir, files, options)
+    if len(requests) > 1:
+        events = _merge_async([
+            _events_async(request)
+            for request in requests])
+    else:
+        events = _events_async(requests[0])
+
+    recording = timings.recording()
+    try:
+        async for event in events:
+            recording.add(event)
+            yield event
+    finally:
+        await events.aclose()
+    if not requests[0]['filter']:
+        recording.commit()
+
+
+class Pipeline(object):
+    """An event generator reading events ahead of its consumer.
+
+    The events are read from the underlying generator by a background thread
+    and put in a bounded queue. This lets the runner process proceed while
+    the consumer is busy, for example while a lifecycle function starts a
+    server, as long as the queue is not full.
+
+    The attributes :attr:`max_depth`, :attr:`stall_time` and
+    :attr:`wait_time` are updated while the events are read.
+
+    :param events: The event generator to read.
+
+    :param int size: The maximum number of events to read ahead.
+    """
+    #: The interval, in seconds, at which a blocked reader checks whether the
+    #: pipeline has been closed
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, events, size):
+        self._events = events
+        self._queue = queue.Queue(size)
+        self._closed = threading.Event()
+        self._done = False
+
+        #: The largest number of events that have been queued
+        self.max_depth = 0
+
+        #: The total time, in seconds, the reader has been blocked because the
+        #: queue was full
+        self.stall_time = 0.0
+
+        #: The total time, in seconds, the consumer has been blocked because
+        #: the queue was empty
+        self.wait_time = 0.0
+
+        self._thread = threading.Thread(target=self._read)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration()
+
+        try:
+            event, error = self._queue.get_nowait()
+        except queue.Empty:
+            start = time.monotonic()
+            event, error = self._queue.get()
+            self.wait_time += time.monotonic() - start
+
+        if error is not None:
+            self._done = True
+            raise error
+        elif event is None:
+            self._done = True
+            raise StopIteration()
+        else:
+            return event
+
+    @property
+    def depth(self):
+        """The number of events currently queued"""
+        return self._queue.qsize()
+
+    def close(self):
+        """Stops reading events and closes the underlying generator.
+
+        The generator is closed by the background thread once it has received
+        its next event.
+        """
+        self._done = True
+        self._closed.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _put(self, item):
+        """Puts an item in the queue, blocking while it is full.
+
+        :param tuple item: The tuple ``(event, error)`` to put.
+        """
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            start = time.monotonic()
+            while not self._closed.is_set():
+                try:
+                    self._queue.put(item, timeout=self.POLL_INTERVAL)
+                    break
+                except queue.Full:
+                    pass
+            self.stall_time += time.monotonic() - start
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _read(self):
+        """Reads events from the underlying generator until it is exhausted or
+        this pipeline is closed.
+        """
+        try:
+            for event in self._events:
+                if self._closed.is_set():
+                    break
+                self._put((event, None))
+            else:
+                self._put((None, None))
+        except Exception as e:
+            self._put((None, e))
+        finally:
+            self._events.close()
+            log.debug(
+                'Pipeline completed; maximum depth %d, stalled %.3f s, '
+                'waited %.3f s',
+                self.max_depth, self.stall_time, self.wait_time)
+
+
+def _prepare(project_dir, files, options):
+    """Prepares a test run.
+
+    This function pops the options ``workers``, ``stream`` and ``filter`` from
+    ``options`` and makes sure that the option ``spec_dir`` is set.
+
+    :param str project_dir: The base project directory.
+
+    :param [str] files: The spec files.
+
+    :param dict options: The configuration options passed to *Jasmine*.
+
+    :return: the tuple ``(timings, requests)``, where ``timings`` is the
+        :class:`unittest_jasmine.scheduler.Timings` to record durations to and
+        ``requests`` the list of run requests, one for every runner process
+    """
+    workers = options.pop('workers', 1)
+    stream = options.pop('stream', False)
+    filter = options.pop('filter', None)
+    if isinstance(filter, str):
+        filter = {'pattern': filter}
+    if filter and filter.get('ids') and workers != 1:
+        raise ValueError(
+            'item IDs cannot be used to filter a run with more than one '
+            'worker')
+    if workers < 1:
+        workers = multiprocessing.cpu_count()
+
     # spec_dir must be set
     if 'spec_dir' not in options:
         options['spec_dir'] = '.'
 
-    p = node.run(
-        ['-e', RUNNER_DATA, project_dir, json.dumps(options)] + list(files),
-        stdout=subprocess.PIPE,
-        stdin=subprocess.PIPE)
+    timings = scheduler.Timings(
+        os.path.join(project_dir, options['spec_dir']))
+    compile_cache = cache.directory(sourcemap.COMPILED_DIRECTORY)
+    shards = scheduler.schedule(files, workers, timings.estimate(files)) \
+        if workers > 1 else [files]
+    return (
+        timings,
+        [
+            {
+                'projectBaseDir': project_dir,
+                'options': options,
+                'specFiles': list(shard),
+                'stream': stream,
+                'compileCache': compile_cache,
+                'filter': filter}
+            for shard in shards])
+
+
+class Pool(object):
+    """A pool of long-lived runner processes.
+
+    Every process loads *Jasmine* once and then serves any number of runs,
+    which avoids the cost of starting ``node`` and loading *Jasmine* for every
+    call to :func:`jasmine`. Between runs, the processes unload every module
+    not loaded from ``node_modules``, so spec and helper files are evaluated
+    anew and no spec state carries over.
+
+    A process that does not complete a run, for example because the event
+    generator was closed early, is killed instead of being reused.
+
+    :param int size: The maximum number of idle processes to keep. This many
+        processes are started immediately.
+
+    :param int max_runs: The number of runs after which a process is replaced
+        with a new one.
+    """
+    #: The default number of runs served by a process before it is replaced
+    MAX_RUNS = 100
+
+    def __init__(self, size=1, max_runs=MAX_RUNS):
+        self._size = size
+        self._max_runs = max_runs
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._idle = [self._spawn() for i in range(size)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def jasmine(self, project_dir, *files, **options):
+        """Generates events from a test run served by this pool.
+
+        See :func:`jasmine` for a description of the arguments.
+        """
+        return jasmine(project_dir, *files, pool=self, **options)
+
+    def close(self):
+        """Terminates all processes of this pool.
+
+        Processes serving a run are killed, and their pipes closed.
+        """
+        with self._lock:
+            idle = self._idle
+            busy = self._workers.difference(idle)
+            self._workers.clear()
+            self._idle = []
+        for worker in busy:
+            self._kill(worker)
+            self._close(worker)
+        for worker in idle:
+            self._stop(worker)
+
+    def _spawn(self):
+        """Starts a new runner process serving requests from ``stdin``.
+
+        :return: the process
+        :rtype: subprocess.Popen
+        """
+        worker = _spawn([])
+        worker.runs = 0
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _acquire(self):
+        """Retrieves an idle process, or starts a new one if none is idle.
 
+        :return: the process
+        :rtype: subprocess.Popen
+        """
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.poll() is None:
+                    return worker
+                self._workers.discard(worker)
+                self._close(worker)
+        return self._spawn()
+
+    def _release(self, worker):
+        """Returns a process to the pool after a completed run.
+
+        The process is terminated if it has served its maximum number of runs
+        or if the pool already has enough idle processes.
+
+        :param subprocess.Popen worker: The process.
+        """
+        worker.runs += 1
+        with self._lock:
+            if worker in self._workers and worker.runs < self._max_runs \
+                    and len(self._idle) < self._size:
+                self._idle.append(worker)
+                return
+            self._workers.discard(worker)
+        self._stop(worker)
+
+    def _stop(self, worker):
+        """Stops an idle process by closing its ``stdin``.
+
+        :param subprocess.Popen worker: The process.
+        """
+        worker.stdin.close()
+        self._close(worker)
+
+    def _close(self, worker):
+        """Waits for a process to terminate and closes its pipes.
+
+        :param subprocess.Popen worker: The process.
+        """
+        worker.wait()
+        try:
+            worker.stdin.close()
+        except BrokenPipeError:
+            # The process has terminated without reading the last request
+            pass
+        worker.channel.close()
+
+    def _kill(self, worker):
+        """Kills a process in an unknown state.
+
+        The pipes of the process are left open, since they may be in use by
+        another thread.
+
+        :param subprocess.Popen worker: The process.
+        """
+        with self._lock:
+            self._workers.discard(worker)
+        if worker.poll() is None:
+            worker.kill()
+
+    def _start(self, request):
+        """Starts a run served by this pool.
+
+        :param dict request: The run request.
+
+        :return: the tuple ``(events, abort)``, as for :func:`_start`
+        """
+        worker = self._acquire()
+        return (
+            self._serve(worker, request),
+            lambda: self._kill(worker))
+
+    def _serve(self, worker, request):
+        """Generates the events of a single run from a pool process.
+
+        :param subprocess.Popen worker: The process.
+
+        :param dict request: The run request.
+        """
+        try:
+            worker.stdin.write(_encode(request))
+            worker.stdin.flush()
+            for event in _frames(worker.channel):
+                if event.get('event') == 'jasmineDone':
+                    break
+                else:
+                    yield event
+            else:
+                raise RuntimeError('%s terminated unexpectedly' % RUNNER_NAME)
+        except:
+            self._kill(worker)
+            self._close(worker)
+            raise
+        else:
+            self._release(worker)
+
+
+def _start(request):
+    """Starts a *Jasmine* runner process for a single run.
+
+    :param dict request: The run request, as returned by :func:`_prepare`.
+
+    :return: the tuple ``(events, abort)``, where ``events`` is the event
+        generator and ``abort`` a callable terminating the run
+    """
+    p = _spawn(['-'])
     try:
-        for line in p.stdout:
-            try:
-                yield json.loads(line.strip().decode('ascii'))
-            except ValueError:
-                log.exception(
-                    'Invalid output from %s: %s',
-                    RUNNER_NAME,
-                    line.strip())
-                continue
+        p.stdin.write(_encode(request))
+        p.stdin.close()
+    except BrokenPipeError:
+        # The runner has terminated; this is reported when reading events
+        pass
+    return (_events(p), p.kill)
+
+
+def _encode(request):
+    """Encodes a run request for a runner process.
+
+    The request is sent on ``stdin`` rather than on the command line, so that
+    its size is not limited by the maximum length of the argument list.
+
+    :param dict request: The run request.
+
+    :return: the request as a line of *JSON*
+    :rtype: bytes
+    """
+    return json.dumps(request).encode('utf-8') + b'\n'
+
+
+def _spawn(arguments):
+    """Starts a runner process with an event channel.
+
+    The events are written by the runner to a pipe separate from ``stdout``
+    and ``stderr``, which are inherited. The read end of the pipe is available
+    as the attribute ``channel`` of the process returned.
+
+    If :attr:`SEPARATE_CHANNEL` is false, the channel is instead ``stdout`` of
+    the runner, which then writes other output to ``stderr``.
+
+    :param [str] arguments: The command line arguments for the runner.
+
+    :return: the process
+    :rtype: subprocess.Popen
+    """
+    if not SEPARATE_CHANNEL:
+        p = node.run(
+            [RUNNER_PATH] + arguments,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=_environment(None))
+        p.channel = p.stdout
+        return p
+
+    r, w = os.pipe()
+    try:
+        p = node.run(
+            [RUNNER_PATH] + arguments,
+            stdin=subprocess.PIPE,
+            pass_fds=(w,),
+            env=_environment(w))
+    except:
+        os.close(r)
+        raise
+    finally:
+        os.close(w)
+    p.channel = os.fdopen(r, 'rb')
+    return p
+
+
+def _environment(fd):
+    """Returns the environment for a runner process.
+
+    :param fd: The file descriptor of the write end of the event channel, as
+        seen by the runner process, or ``None`` to make the runner write
+        events to ``stdout``.
+    :type fd: int or None
+
+    :return: the environment
+    :rtype: dict
+    """
+    environment = dict(os.environ)
+    if fd is None:
+        environment.pop(EVENT_FD_VARIABLE, None)
+    else:
+        environment[EVENT_FD_VARIABLE] = str(fd)
+    return environment
+
+
+def _parse(payload):
+    """Parses the payload of an event frame.
+
+    The time at which the frame was received is added to the event as
+    :attr:`RECEIVED_KEY`, so that the time spent waiting for the runner can be
+    told apart from the time spent processing the event.
+
+    :param bytes payload: The payload to parse.
+
+    :return: the event, or ``None`` if the payload is invalid
+    :rtype: dict or None
+    """
+    received = time.perf_counter()
+    try:
+        event = json.loads(payload.decode('utf-8'))
+        event[RECEIVED_KEY] = received
+        return event
+    except ValueError:
+        log.exception(
+            'Invalid output from %s: %r',
+            RUNNER_NAME,
+            payload)
+        return None
+
+
+def _frames(channel):
+    """Generates events from an event channel until it is closed.
+
+    Every event is sent as a frame consisting of the payload length, encoded as
+    a 32 bit big endian integer, followed by the payload.
+
+    :param channel: The event channel, opened in binary mode.
+    """
+    while True:
+        header = channel.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            if header:
+                log.error('Truncated frame from %s', RUNNER_NAME)
+            return
+        length, = FRAME_HEADER.unpack(header)
+        payload = channel.read(length)
+        if len(payload) < length:
+            log.error('Truncated frame from %s', RUNNER_NAME)
+            return
+        event = _parse(payload)
+        if event is not None:
+            yield event
+
+
+def _events(p):
+    """Generates events from a runner process.
+
+    The process pipes are closed when the generator is exhausted or closed.
+
+    :param subprocess.Popen p: The runner process.
+    """
+    try:
+        for event in _frames(p.channel):
+            yield event
     finally:
         p.stdin.close()
-        p.stdout.close()
+        p.channel.close()
+
+
+def _prefix(index):
+    """Returns the ID prefix of a shard.
+
+    :param int index: The shard index.
+
+    :return: the prefix
+    :rtype: str
+    """
+    return '%d:' % index
+
+
+def _rename(item, prefix):
+    """Prefixes the IDs of a test tree item and all its descendants.
+
+    :param dict item: The test tree item, as output by ``runner.js``.
+
+    :param str prefix: The prefix to add.
+
+    :return: ``item``
+    """
+    item['id'] = prefix + item['id']
+    for child in item.get('children', []):
+        _rename(child, prefix)
+    return item
+
+
+def _rename_event(event, prefix):
+    """Prefixes the item ID of an event, and the IDs of any children sent with
+    it.
+
+    :param dict event: The event.
+
+    :param str prefix: The prefix to add.
+
+    :return: ``event``
+    """
+    data = event.get('data')
+    if data and 'id' in data:
+        data['id'] = prefix + data['id']
+        for child in data.get('children', []):
+            _rename(child, prefix)
+    return event
+
+
+def _merge_trees(trees):
+    """Merges the test trees of several shards into the tree of the first
+    shard.
+
+    The IDs of all items are prefixed with the index of their shard.
+
+    :param [dict] trees: The test trees, in shard order. An item is ``None``
+        if the shard did not output a tree.
+
+    :return: the merged tree
+
+    :raises RuntimeError: if a tree is missing
+    """
+    tree = None
+    for i, shard_tree in enumerate(trees):
+        if shard_tree is None:
+            raise RuntimeError('no test tree read from shard %d' % i)
+        _rename(shard_tree, _prefix(i))
+        if tree is None:
+            tree = shard_tree
+        else:
+            tree['children'].extend(shard_tree['children'])
+    return tree
+
+
+def _merge(runs):
+    """Generates the merged events of several runs.
+
+    The events of every run are read by a background thread, so that all
+    runs proceed concurrently regardless of how fast the events are consumed.
+    The test trees are merged into one, and the events of the runs are then
+    generated in shard order.
+
+    Any run not yet completed when the generator is closed is aborted.
+
+    :param runs: The runs, in shard order, as returned by :func:`_start`.
+    """
+    def reader(events, q):
+        try:
+            for event in events:
+                q.put((event, None))
+        except Exception as e:
+            q.put((None, e))
+        finally:
+            q.put((None, None))
+
+    def drain(q):
+        while True:
+            event, error = q.get()
+            if error is not None:
+                raise error
+            elif event is None:
+                return
+            else:
+                yield event
+
+    queues = [queue.Queue() for run in runs]
+    threads = [
+        threading.Thread(target=reader, args=(events, q))
+        for (events, abort), q in zip(runs, queues)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        streams = [drain(q) for q in queues]
+        yield _merge_trees([next(stream, None) for stream in streams])
+
+        for i, stream in enumerate(streams):
+            for event in stream:
+                yield _rename_event(event, _prefix(i))
+
+    finally:
+        for (events, abort), thread in zip(runs, threads):
+            if thread.is_alive():
+                abort()
+        for thread in threads:
+            thread.join()
+
+
+async def _events_async(request):
+    """Asynchronously generates events from a new runner process.
+
+    :param dict request: The run request, as returned by :func:`_prepare`.
+    """
+    if SEPARATE_CHANNEL:
+        r, w = os.pipe()
+        try:
+            p = await asyncio.create_subprocess_exec(
+                node.binary(),
+                RUNNER_PATH, '-',
+                stdin=subprocess.PIPE,
+                pass_fds=(w,),
+                env=_environment(w))
+        except:
+            os.close(r)
+            raise
+        finally:
+            os.close(w)
+
+        channel = asyncio.StreamReader()
+        transport, protocol = \
+            await asyncio.get_running_loop().connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(channel),
+                os.fdopen(r, 'rb', 0))
+    else:
+        p = await asyncio.create_subprocess_exec(
+            node.binary(),
+            RUNNER_PATH, '-',
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=_environment(None))
+        channel = p.stdout
+        transport = None
+    try:
+        try:
+            p.stdin.write(_encode(request))
+            await p.stdin.drain()
+            p.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # The runner has terminated; this is reported when reading events
+            pass
+        while True:
+            try:
+                header = await channel.readexactly(FRAME_HEADER.size)
+                length, = FRAME_HEADER.unpack(header)
+                payload = await channel.readexactly(length)
+            except asyncio.IncompleteReadError as e:
+                if e.partial:
+                    log.error('Truncated frame from %s', RUNNER_NAME)
+                break
+            event = _parse(payload)
+            if event is not None:
+                yield event
+    finally:
+        if transport is not None:
+            transport.close()
+        if p.returncode is None:
+            try:
+                p.kill()
+            except ProcessLookupError:
+                pass
+        await p.wait()
+
+
+async def _merge_async(streams):
+    """Asynchronously generates the merged events of several runs.
+
+    This is the :mod:`asyncio` counterpart of :func:`_merge`; the streams are
+    consumed by tasks instead of threads.
+
+    :param streams: The event generators of the runs, in shard order.
+    """
+    async def reader(events, q):
+        try:
+            async for event in events:
+                await q.put((event, None))
+        except Exception as e:
+            await q.put((None, e))
+        finally:
+            await q.put((None, None))
+
+    async def drain(q):
+        while True:
+            event, error = await q.get()
+            if error is not None:
+                raise error
+            elif event is None:
+                return
+            else:
+                yield event
+
+    queues = [asyncio.Queue() for stream in streams]
+    tasks = [
+        asyncio.ensure_future(reader(stream, q))
+        for stream, q in zip(streams, queues)]
+
+    try:
+        drains = [drain(q) for q in queues]
+        trees = []
+        for events in drains:
+            async for tree in events:
+                trees.append(tree)
+                break
+            else:
+                trees.append(None)
+        yield _merge_trees(trees)
+
+        for i, events in enumerate(drains):
+            async for event in events:
+                yield _rename_event(event, _prefix(i))
+
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 def _get_runner_from_filesystem():
-    with open(os.path.join(os.path.dirname(__file__), RUNNER_NAME), 'r') as f:
-        return f.read()
+    path = os.path.join(os.path.dirname(__file__), RUNNER_NAME)
+    if not os.path.isfile(path):
+        raise IOError(path)
+    return path
 
 
 def _get_runner_from_pkgresources():
-    return pkg_resources.resource_stream(
-        __name__.rsplit('.', 1)[0], RUNNER_NAME).read()
+    # This extracts the runner if the package is zipped
+    return pkg_resources.resource_filename(
+        __name__.rsplit('.', 1)[0], RUNNER_NAME)
 
 
 def _get_runner():
@@ -97,6 +938,8 @@ def _get_runner():
 
 
 try:
-    RUNNER_DATA = _get_runner()
+    #: The path of the runner *JavaScript*; the runner is executed from this
+    #: file, so that the command line does not grow with the script
+    RUNNER_PATH = _get_runner()
 except:
     raise ImportError('failed to load Jasmine runner')
@@ -0,0 +1,227 @@
+# coding=utf-8
+# unittest-jasmine
+# Copyright (C) 2015 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+This module distributes spec files between workers.
+
+The durations of specs are recorded in a :class:`Timings` database every time
+a test run completes, and :func:`schedule` uses them to give every worker
+approximately the same amount of work, using the *longest processing time
+first* strategy.
+"""
+
+import heapq
+import os
+
+from . import cache
+
+
+class Timings(object):
+    """The durations of spec files and specs recorded from earlier runs.
+
+    :param str spec_dir: The directory containing the spec files. The database
+        is specific for this directory.
+    """
+    def __init__(self, spec_dir):
+        self._spec_dir = os.path.abspath(spec_dir)
+        self._path = os.path.join(
+            cache.directory('timings'),
+            cache.key(self._spec_dir) + '.json')
+        data = cache.load(self._path, {})
+        self._files = data.get('files', {})
+        self._specs = data.get('specs', {})
+
+    @property
+    def files(self):
+        """A mapping from spec file name, relative to the spec directory, to
+        its duration in seconds"""
+        return self._files
+
+    @property
+    def specs(self):
+        """A mapping from spec full name to its duration in seconds"""
+        return self._specs
+
+    def save(self):
+        """Writes the database to the cache.
+        """
+        cache.store(self._path, {
+            'files': self._files,
+            'specs': self._specs})
+
+    def estimate(self, files):
+        """Estimates the durations of spec files.
+
+        Files with a recorded duration use that value. The durations of other
+        files are estimated from their sizes, scaled by the ratio of duration
+        to size of the recorded files. If no file has a recorded duration, the
+        raw file sizes are used.
+
+        :param [str] files: The spec files, relative to the spec directory.
+
+        :return: a mapping from file name to estimated duration
+        :rtype: dict
+        """
+        def size(f):
+            try:
+                return os.path.getsize(os.path.join(self._spec_dir, f))
+            except OSError:
+                return 0
+
+        files = [os.path.normpath(f) for f in files]
+        known = [f for f in files if f in self._files]
+        known_size = sum(size(f) for f in known)
+        scale = sum(self._files[f] for f in known) / known_size \
+            if known_size else 1.0
+
+        return dict(
+            (f, self._files[f] if f in self._files else size(f) * scale)
+            for f in files)
+
+    def record(self, events):
+        """Records spec durations from a stream of runner events.
+
+        The events are passed through unchanged. The top level items of the
+        test tree must have the key ``'file'``, and ``specDone`` events the
+        key ``'duration'``, in milliseconds.
+
+        The database is saved only if the stream is exhausted, so that an
+        interrupted run does not record partial durations for a file.
+
+        :param events: The event generator, as returned by
+            :func:`unittest_jasmine.runner.jasmine`.
+        """
+        recording = self.recording()
+        for event in events:
+            recording.add(event)
+            yield event
+        recording.commit()
+
+    def recording(self):
+        """Creates an object recording the durations of a single run.
+
+        This is used by :meth:`record`; use it directly when the events are
+        not available as a generator.
+
+        :return: a recording
+        :rtype: Recording
+        """
+        return Recording(self)
+
+
+class Recording(object):
+    """The durations recorded from a single run.
+
+    Pass every event of the run to :meth:`add`, and call :meth:`commit` once
+    the run has completed.
+
+    :param Timings timings: The database to which to commit the durations.
+    """
+    def __init__(self, timings):
+        self._timings = timings
+        self._spec_files = None
+        self._files = {}
+        self._specs = {}
+
+    def add(self, event):
+        """Records an event.
+
+        The first event must be the test tree.
+
+        :param dict event: The event.
+        """
+        if self._spec_files is None:
+            self._spec_files = {}
+            for child in event['children']:
+                self._walk(child, child.get('file'))
+
+        elif event.get('event') == 'suiteStarted':
+            # Streamed test trees announce the children of a suite when it is
+            # started
+            data = event['data']
+            file = self._spec_files.get(data['id'])
+            for child in data.get('children', []):
+                self._walk(child, file)
+
+        elif event.get('event') == 'specDone':
+            data = event['data']
+            duration = data.get('duration')
+            if duration is not None:
+                duration /= 1000.0
+                self._specs[data['fullName']] = duration
+                file = self._spec_files.get(data['id'])
+                if file is not None:
+                    self._files[file] = self._files.get(file, 0.0) + duration
+
+    def _walk(self, item, file):
+        """Records the spec file of a test tree item and all its descendants.
+
+        :param dict item: The test tree item.
+
+        :param str file: The spec file.
+        """
+        self._spec_files[item['id']] = file
+        for child in item.get('children', []):
+            self._walk(child, file)
+
+    def commit(self):
+        """Updates the database with the recorded durations and saves it.
+
+        If no event has been recorded, this method does nothing.
+        """
+        if self._spec_files is not None:
+            self._timings.files.update(self._files)
+            self._timings.specs.update(self._specs)
+            self._timings.save()
+
+
+def schedule(files, count, durations):
+    """Distributes spec files between workers.
+
+    The files are assigned in order of decreasing duration, each to the worker
+    with the least total work so far. Each worker receives its files in the
+    order of ``files``.
+
+    :param [str] files: The spec files.
+
+    :param int count: The maximum number of workers.
+
+    :param dict durations: A mapping from file name to estimated duration, as
+        returned by :meth:`Timings.estimate`.
+
+    :return: a list of non-empty shards
+    :rtype: [[str]]
+    """
+    files = list(files)
+    order = dict((f, i) for i, f in enumerate(files))
+
+    def duration(f):
+        return durations.get(os.path.normpath(f), 0.0)
+
+    # Ties are broken by the number of files, so that files without duration
+    # are spread as well
+    workers = [
+        (0.0, 0, i, [])
+        for i in range(max(1, min(count, len(files))))]
+    for f in sorted(files, key=duration, reverse=True):
+        total, length, i, shard = heapq.heappop(workers)
+        shard.append(f)
+        heapq.heappush(workers, (total + duration(f), length + 1, i, shard))
+
+    return [
+        sorted(shard, key=order.get)
+        for total, length, i, shard in sorted(workers, key=lambda w: w[2])
+        if shard]
@@ -26,7 +26,7 @@ import re
 import setuptools.command.test
 import types
 
-from . import data, package_manager, runner, unittest
+from . import data, discovery, package_manager, runner, timing, unittest
 
 
 def suite_setup(suite):
@@ -81,6 +81,7 @@ class SetuptoolsLoader(setuptools.command.test.ScanningLoader):
     By default, this loader will, in addition to the tests loaded by
     :class:`setuptools.command.test.ScanningLoader`, load all files matching
     the pattern ``*spec.js`` in the *unittest* test package directory.
+    Subdirectories are searched only if the option ``include`` is passed.
 
     This loader extends the interpretation of the ``test_suite`` parameter to
     :func:`setuptools.setup` as
@@ -101,9 +102,19 @@ class SetuptoolsLoader(setuptools.command.test.ScanningLoader):
 
     If the spec files do not match the pattern above, or if you intend to run
     *CoffeeScript* specs, you must specify ``spec_regexp``. An example value is
-    ``'test|spec_regexp=.*?\.(coffee|js)'``. Also note that in order to run
-    *CoffeeScript* specs, you must add the call
-    ``require("coffee-script/register")`` to one of the helper files.
+    ``'test|spec_regexp=.*?\.(coffee|js)'``. *CoffeeScript* specs are compiled
+    by the compiler installed for the project, ``coffee-script`` or
+    ``coffeescript``, and the compiled code is cached. A compiler registered
+    by a helper file, for example by calling
+    ``require("coffee-script/register")``, is used instead if present.
+
+    To select spec files by their paths relative to ``test_directory``, pass
+    glob patterns as the options ``include`` and ``exclude``, either as a
+    string or as a *JSON* list of strings. ``**`` matches any number of
+    directories; an example value is
+    ``'test|include=["spec/**/*.js"];exclude=["spec/fixtures/**"]'``. If
+    ``include`` is passed, ``spec_regex`` is not used; otherwise only the files
+    directly in ``test_directory`` are loaded.
 
     If you have any *Python* code to run before and after suites and tests are
     run, implement the functions :func:`suite_setup`, :func:`suite_teardown`,
@@ -111,6 +122,34 @@ class SetuptoolsLoader(setuptools.command.test.ScanningLoader):
     as the option ``lifecycle``. This is where to implement launching of for
     example the *Python* web server being tested.
 
+    To run the spec files in parallel, pass the number of ``node`` processes to
+    use as the option ``workers``. The spec files are split between the
+    processes, and the results are merged into one test suite. A value less
+    than ``1`` means one process per CPU.
+
+    To let *Jasmine* proceed while lifecycle functions are running, pass the
+    number of events to read ahead as the option ``pipeline``.
+
+    For very large suites, pass ``stream=true`` to have the runner announce
+    the children of every suite only when it is started, instead of sending
+    the entire test tree before running the first spec.
+
+    To find out where the time of a run is spent, pass the name of a file to
+    which to write a *JSON* report as the option ``profile``, and the number
+    of the slowest specs and suites to print once the run has completed as the
+    option ``profile_top``.
+
+    To run only some of the specs, pass the option ``filter``. Its value is
+    either a *JavaScript* regular expression, matched anywhere in the full
+    names of specs, or a *JSON* object with any of the keys ``pattern``, a
+    regular expression as above, ``ids``, a list of item IDs from the test
+    tree of an earlier run, and ``locations``, a list of locations on the form
+    ``"file:line"`` relative to ``test_directory``, each selecting the spec or
+    suite defined closest before ``line``. A spec must match every key passed.
+    An example value is
+    ``'test|filter={"locations": ["player-spec.js:12"]}'``. The specs not
+    selected are never run; see :func:`unittest_jasmine.runner.jasmine`.
+
     Any other option values will be passed to the *Jasmine* ``loadConfig``
     method.
 
@@ -118,7 +157,22 @@ class SetuptoolsLoader(setuptools.command.test.ScanningLoader):
     be a list of strings, so it must be a *JSON* value. It is interpreted as a
     list of helper files, relative to ``test_directory``, that *Jasmine* will
     load before running the tests.
+
+    Dependencies are installed in the background as soon as a test directory
+    has been found. The *Jasmine* tests are loaded only when they are about to
+    run, after waiting for the installation, so the *unittest* tests run while
+    the dependencies are installed. Until then, they are represented by a
+    single placeholder test named ``jasmine``.
+
+    If :attr:`testNamePatterns` is set, for example by the ``-k`` command line
+    option of :mod:`unittest`, only the specs with a full name matching any of
+    the patterns are run by *Jasmine*. The patterns are combined with the
+    option ``filter``, if it is passed.
     """
+    def __init__(self):
+        super(SetuptoolsLoader, self).__init__()
+        self._installation = None
+
     def _parse_option(self, option):
         """Parses an option string.
 
@@ -181,30 +235,87 @@ class SetuptoolsLoader(setuptools.command.test.ScanningLoader):
         except ImportError:
             return None
 
-    def _apply_lifecycle(self, test_item, lifecycle):
-        """Sets the setup and teardown methods of all test items recursively.
+    def _filter(self):
+        """Generates the *JavaScript* regular expression used to select specs
+        from :attr:`testNamePatterns`.
 
-        :param test_item: The test item to modify. If this is a suite, this
-            method is called recursively for all children.
-        :type test_item: unittest_jasmine.unittest.Test or
-            unittest_jasmine.unittest.Suite
+        The patterns are matched against the full names of the specs in the
+        same way as :mod:`unittest` matches them against test names.
 
-        :param lifecycle: The module containing the event functions.
+        :return: a regular expression, or ``None`` if no patterns are set
+        :rtype: str or None
         """
-        def add(target, source):
-            setattr(
-                test_item,
-                target,
-                getattr(
-                    lifecycle, source, globals()[source]).__get__(test_item))
-        if isinstance(test_item, unittest.Suite):
-            add('setUp', 'suite_setup')
-            add('tearDown', 'suite_teardown')
-            for child in test_item.children:
-                self._apply_lifecycle(child, lifecycle)
-        elif isinstance(test_item, unittest.Test):
-            add('setUp', 'test_setup')
-            add('tearDown', 'test_teardown')
+        patterns = getattr(self, 'testNamePatterns', None)
+        if not patterns:
+            return None
+
+        def escape(c):
+            return '\\' + c if c in '\\^$.|+()[]{}/-' else c
+
+        def translate(pattern):
+            # Translate the pattern as fnmatch does; [seq] and [!seq] are
+            # character classes, and a [ without a closing ] is literal
+            result = []
+            i = 0
+            while i < len(pattern):
+                c = pattern[i]
+                i += 1
+                if c == '*':
+                    result.append('.*')
+                elif c == '?':
+                    result.append('.')
+                elif c == '[':
+                    j = i
+                    if j < len(pattern) and pattern[j] == '!':
+                        j += 1
+                    if j < len(pattern) and pattern[j] == ']':
+                        j += 1
+                    j = pattern.find(']', j)
+                    if j < 0:
+                        result.append(escape(c))
+                    else:
+                        negate = pattern[i] == '!'
+                        sequence = pattern[i + 1 if negate else i:j]
+                        result.append('[%s%s]' % (
+                            '^' if negate else '',
+                            ''.join(
+                                d if d == '-' else escape(d)
+                                for d in sequence)))
+                        i = j + 1
+                else:
+                    result.append(escape(c))
+            return ''.join(result)
+
+        return '^(?:%s)$' % '|'.join(translate(p) for p in patterns)
+
+    def _spec_files(self, test_directory, spec_regex, include, exclude):
+        """Finds the spec files to load.
+
+        Unless ``include`` is passed, only the files directly in the test
+        directory with names matching ``spec_regex`` are loaded.
+
+        :param str test_directory: The test directory.
+
+        :param spec_regex: The regular expression to match against file names
+            when ``include`` is ``None``.
+
+        :param include: The glob patterns of the files to include, or ``None``.
+        :type include: [str] or None
+
+        :param exclude: The glob patterns of the files and directories to
+            exclude, or ``None`` to use the default patterns.
+        :type exclude: [str] or None
+
+        :return: the paths of the spec files, relative to ``test_directory``
+        :rtype: [str]
+        """
+        if include is not None:
+            return discovery.find(test_directory, include, exclude)
+        else:
+            return [
+                f
+                for f in discovery.find(test_directory, ['*'], exclude)
+                if spec_regex.match(f)]
 
     def loadTestsFromNames(self, names, module=None):
         # Extract the package name and options from the names passed; names
@@ -226,41 +337,71 @@ class SetuptoolsLoader(setuptools.command.test.ScanningLoader):
             'spec_regex',
             r'.*?spec\.js'))
 
+        include = options.pop('include', None)
+        if isinstance(include, str):
+            include = [include]
+
+        exclude = options.pop('exclude', None)
+        if isinstance(exclude, str):
+            exclude = [exclude]
+
         lifecycle = importlib.import_module(options.pop(
             'lifecycle',
             __name__))
 
-        # If we have a test directory, load the tests
+        profile_path = options.pop('profile', None)
+        profile_top = options.pop('profile_top', 10 if profile_path else 0)
+
+        # If we have a test directory, load the tests once the dependencies
+        # have been installed
+        filter = options.pop('filter', None)
+        if isinstance(filter, str):
+            filter = {'pattern': filter}
+        pattern = self._filter()
+        if pattern is not None:
+            filter = dict(filter or {})
+            if 'pattern' in filter:
+                # Both patterns must match; the pattern of the filter option is
+                # not anchored, so it may match anywhere in the name
+                pattern = '^(?=[\\s\\S]*?(?:%s))%s' % (
+                    filter['pattern'], pattern[1:])
+            filter['pattern'] = pattern
+        if filter:
+            options['filter'] = filter
+
         if test_directory:
-            jasmine = runner.jasmine(
-                test_directory,
-                *(
-                    f
-                    for f in os.listdir(test_directory)
-                    if spec_regex.match(f)),
-                **options)
-
-            # Read the full test tree and make sure it knows about Jasmine
-            top_suite = data.parse(
-                next(jasmine),
-                spec=unittest.Test,
-                suite=unittest.Suite)
-            top_suite.jasmine = jasmine
-
-            # Make sure setup and teardown functions are called; do not modify
-            # the top suite, as user tests should not receive notifications
-            # about it
-            for suite in top_suite.children:
-                self._apply_lifecycle(suite, lifecycle)
-
-            # Make sure that dependencies are installed when the top suite is
-            # run
-            def install_dependencies(self):
-                package_manager.install_dependencies()
-
-            top_suite.setUp = install_dependencies.__get__(top_suite)
+            # Install the dependencies while the unittest tests run
+            if self._installation is None:
+                self._installation = package_manager.Installation()
+
+            def load():
+                self._installation.wait()
+                jasmine = runner.jasmine(
+                    test_directory,
+                    *self._spec_files(
+                        test_directory, spec_regex, include, exclude),
+                    **options)
+
+                # Read the full test tree and make sure it knows about Jasmine
+                top_suite = data.parse(
+                    next(jasmine),
+                    spec=unittest.Test,
+                    suite=unittest.Suite)
+                top_suite.jasmine = jasmine
+
+                # Make sure setup and teardown functions are called; the top
+                # suite does not notify the lifecycle module, as user tests
+                # should not receive notifications about it
+                top_suite.lifecycle = lifecycle
+
+                # Record where the time is spent, if requested
+                if profile_path or profile_top:
+                    top_suite.profile = timing.Profile(
+                        profile_path, profile_top)
+
+                return top_suite
 
             # Finally add the test suite
-            tests.addTest(top_suite)
+            tests.addTest(unittest.DeferredSuite(load))
 
         return tests
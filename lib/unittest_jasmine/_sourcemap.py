@@ -0,0 +1,263 @@
+# coding=utf-8
+# unittest-jasmine
+# Copyright (C) 2015 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+This module maps locations in generated *JavaScript* files back to their
+sources using source maps.
+
+The source map of a file is found, in order of preference, through a
+``sourceMappingURL`` comment in the file, which may be an inline ``data:`` URL,
+as the file with the suffix ``.map`` next to it, or, for *CoffeeScript* files
+compiled by the runner, in the compile cache.
+
+Every source map is decoded only once into an index of the segments of every
+generated line, sorted by column, and kept as long as the generated file is
+unchanged.
+"""
+
+import base64
+import bisect
+import hashlib
+import json
+import logging
+import os
+import urllib.parse
+
+from . import cache
+
+
+log = logging.getLogger(__name__)
+
+
+#: The name of the cache directory containing code compiled by the runner
+COMPILED_DIRECTORY = 'compiled'
+
+#: The values of the base 64 digits used by VLQ encoded values
+_BASE64 = dict(
+    (c, i)
+    for i, c in enumerate(
+        'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'))
+
+#: The comment referring to the source map of a file
+_URL_COMMENT = 'sourceMappingURL='
+
+#: The decoded source maps, keyed by generated file name; the values are the
+#: tuple ``(stamp, source_map)``
+_source_maps = {}
+
+
+class SourceMap(object):
+    """A decoded source map.
+
+    :param dict data: The source map, as decoded from *JSON*.
+
+    :param str base: The directory relative to which source file names are
+        resolved.
+
+    :param str source: A file name to use for all sources, instead of the names
+        in ``data``.
+
+    :raises ValueError: if the mappings are invalid
+    """
+    __slots__ = ('_sources', '_columns', '_segments')
+
+    def __init__(self, data, base, source=None):
+        root = data.get('sourceRoot') or ''
+        self._sources = [
+            source if source is not None else
+            name if '://' in name else
+            os.path.normpath(os.path.join(base, root, name))
+            for name in data.get('sources', [])]
+
+        # Every line is a list of generated columns and a corresponding list
+        # of the tuples (source, line, column)
+        self._columns = []
+        self._segments = []
+        index = line = column = 0
+        for text in data.get('mappings', '').split(';'):
+            segments = []
+            generated = 0
+            for segment in text.split(','):
+                if not segment:
+                    continue
+                values = decode(segment)
+                generated += values[0]
+                if len(values) >= 4:
+                    index += values[1]
+                    line += values[2]
+                    column += values[3]
+                    segments.append((generated, (index, line, column)))
+            segments.sort(key=lambda s: s[0])
+            self._columns.append([s[0] for s in segments])
+            self._segments.append([s[1] for s in segments])
+
+    def lookup(self, line, column):
+        """Maps a location in the generated file to its source.
+
+        A column before the first segment of a line is mapped by the first
+        segment.
+
+        :param int line: The line number, starting at ``1``.
+
+        :param int column: The column number, starting at ``1``.
+
+        :return: the tuple ``(file, line, column)``, with numbers starting at
+            ``1``, or ``None`` if the line is not mapped
+        """
+        if not 0 < line <= len(self._columns) or not self._columns[line - 1]:
+            return None
+        columns = self._columns[line - 1]
+        index = max(0, bisect.bisect_right(columns, column - 1) - 1)
+        source, source_line, source_column = self._segments[line - 1][index]
+        if not 0 <= source < len(self._sources):
+            return None
+        return (self._sources[source], source_line + 1, source_column + 1)
+
+
+def decode(segment):
+    """Decodes the base 64 VLQ values of a source map segment.
+
+    :param str segment: The segment.
+
+    :return: the values
+    :rtype: [int]
+
+    :raises ValueError: if the segment is invalid
+    """
+    values = []
+    value = shift = 0
+    for c in segment:
+        try:
+            digit = _BASE64[c]
+        except KeyError:
+            raise ValueError(segment)
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            values.append(-(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    if shift:
+        raise ValueError(segment)
+    return values
+
+
+def lookup(filename, line, column):
+    """Maps a location in a generated file to its source.
+
+    :param str filename: The generated file.
+
+    :param int line: The line number, starting at ``1``.
+
+    :param int column: The column number, starting at ``1``.
+
+    :return: the tuple ``(file, line, column)``, or ``None`` if the file has no
+        source map or the location is not mapped
+    """
+    source_map = load(filename)
+    return source_map.lookup(line, column) if source_map else None
+
+
+def load(filename):
+    """Loads the source map of a generated file.
+
+    The source map is decoded only if the file has changed since the last
+    call.
+
+    :param str filename: The generated file.
+
+    :return: the source map, or ``None`` if the file has none
+    :rtype: SourceMap or None
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    stamp = (stat.st_size, stat.st_mtime)
+
+    entry = _source_maps.get(filename)
+    if entry is None or entry[0] != stamp:
+        try:
+            source_map = _read(filename)
+        except (OSError, ValueError, KeyError, TypeError):
+            log.warning('Invalid source map for %s', filename, exc_info=True)
+            source_map = None
+        entry = _source_maps[filename] = (stamp, source_map)
+    return entry[1]
+
+
+def _read(filename):
+    """Reads and decodes the source map of a generated file.
+
+    :param str filename: The generated file.
+
+    :return: the source map, or ``None`` if the file has none
+    :rtype: SourceMap or None
+    """
+    directory = os.path.dirname(filename)
+
+    # Look for a sourceMappingURL comment
+    with open(filename, 'rb') as f:
+        text = f.read().decode('utf-8', 'replace')
+    offset = text.rfind(_URL_COMMENT)
+    if offset >= 0 and text[offset - 4:offset].strip() in ('//#', '//@'):
+        url = text[offset + len(_URL_COMMENT):].split(None, 1)[0]
+        if url.startswith('data:'):
+            header, _, payload = url[len('data:'):].partition(',')
+            data = base64.b64decode(payload) \
+                if header.endswith(';base64') \
+                else urllib.parse.unquote(payload)
+            return SourceMap(json.loads(data), directory)
+        else:
+            path = os.path.join(
+                directory,
+                urllib.parse.unquote(url.split('?', 1)[0]))
+            return _read_file(path)
+
+    # Look for a map next to the file
+    if os.path.isfile(filename + '.map'):
+        return _read_file(filename + '.map')
+
+    # Look for a map stored by the runner when compiling the file
+    compiled = cache.directory(COMPILED_DIRECTORY)
+    pointer = os.path.join(
+        compiled,
+        'maps',
+        hashlib.sha1(filename.encode('utf-8')).hexdigest())
+    try:
+        with open(pointer, 'r') as f:
+            key = f.read().strip()
+    except OSError:
+        return None
+    return _read_file(os.path.join(compiled, key + '.map'), filename)
+
+
+def _read_file(path, source=None):
+    """Reads and decodes a source map file.
+
+    :param str path: The source map file.
+
+    :param str source: A file name to use for all sources.
+
+    :return: the source map, or ``None`` if the file does not exist
+    :rtype: SourceMap or None
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+    except FileNotFoundError:
+        return None
+    return SourceMap(data, os.path.dirname(path), source)
@@ -0,0 +1,227 @@
+# coding=utf-8
+# unittest-jasmine
+# Copyright (C) 2015 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+This module implements a content-addressed store of installed dependency
+trees, shared by all working copies using the same cache directory.
+
+Every file of an installed tree is stored once, named by the hash of its
+content, and a manifest listing the directories, files and symbolic links of
+the tree is stored under a key identifying the dependencies. Files are copied
+into the store, or cloned if the file system supports it, so the tree being
+added is never shared with the store and may be modified afterwards.
+
+A tree is materialised by recreating the directories and symbolic links, and
+linking the files from the store. Files are hard linked if possible, otherwise
+cloned, and copied as a last resort. Since hard linked files are shared, a
+file modified in one materialised tree is modified in all of them, and in the
+store.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import cache
+
+
+#: The environment variable used to enable the store
+ENVIRONMENT_VARIABLE = 'UNITTEST_JASMINE_STORE'
+
+#: The ``ioctl`` request used to clone a file on *Linux*
+FICLONE = 0x40049409
+
+#: The size of the blocks read when hashing files
+BLOCK_SIZE = 1024 * 1024
+
+
+def enabled():
+    """Returns whether the store is enabled.
+
+    The store is enabled by setting :data:`ENVIRONMENT_VARIABLE` to a non-empty
+    value other than ``0``.
+
+    :rtype: bool
+    """
+    return os.environ.get(ENVIRONMENT_VARIABLE, '0') not in ('', '0')
+
+
+def contains(key):
+    """Returns whether a tree is stored.
+
+    :param str key: The key of the tree.
+
+    :rtype: bool
+    """
+    return os.path.isfile(_manifest_path(key))
+
+
+def ingest(directory, key):
+    """Adds a directory tree to the store.
+
+    Files already in the store are not stored again.
+
+    :param str directory: The root of the tree.
+
+    :param str key: The key under which to store the tree.
+    """
+    entries = []
+    for root, dirs, files in os.walk(directory):
+        relative_root = os.path.relpath(root, directory)
+        for name in sorted(dirs):
+            path = os.path.join(root, name)
+            relative = os.path.normpath(os.path.join(relative_root, name))
+            if os.path.islink(path):
+                entries.append(('l', relative, os.readlink(path)))
+                dirs.remove(name)
+            else:
+                entries.append(('d', relative, None))
+
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relative = os.path.normpath(os.path.join(relative_root, name))
+            if os.path.islink(path):
+                entries.append(('l', relative, os.readlink(path)))
+            elif os.path.isfile(path):
+                entries.append(('f', relative, _add(path)))
+
+    cache.store(_manifest_path(key), entries)
+
+
+def materialize(directory, key):
+    """Recreates a stored tree.
+
+    Anything already at ``directory`` is removed.
+
+    :param str directory: The root of the tree to create.
+
+    :param str key: The key of the tree.
+
+    :raises KeyError: if the tree is not stored
+    """
+    entries = cache.load(_manifest_path(key))
+    if entries is None:
+        raise KeyError(key)
+
+    if os.path.lexists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+    for kind, relative, value in entries:
+        path = os.path.join(directory, relative)
+        if kind == 'd':
+            os.mkdir(path)
+        elif kind == 'l':
+            os.symlink(value, path)
+        else:
+            _link(os.path.join(cache.directory('store', 'files'), value), path)
+
+
+def _manifest_path(key):
+    """Returns the path of the manifest of a tree.
+
+    :param str key: The key of the tree.
+
+    :rtype: str
+    """
+    return os.path.join(cache.directory('store', 'trees'), key + '.json')
+
+
+def _add(path):
+    """Adds a file to the store.
+
+    The name of a stored file is the hash of its content, with the suffix
+    ``'x'`` if it is executable, since the mode is shared by hard links. The
+    file is copied before it is hashed, so the name always matches the content
+    even if the original is modified.
+
+    :param str path: The file to add.
+
+    :return: the name of the file in the store
+    :rtype: str
+    """
+    files = cache.directory('store', 'files')
+    fd, temporary = tempfile.mkstemp(dir=files, prefix='.tmp-')
+    os.close(fd)
+    try:
+        os.unlink(temporary)
+        _copy(path, temporary)
+
+        digest = hashlib.sha1()
+        with open(temporary, 'rb') as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+                digest.update(block)
+        executable = os.stat(temporary).st_mode & stat.S_IXUSR
+        name = digest.hexdigest() + ('x' if executable else '')
+
+        target = os.path.join(files, name)
+        if os.path.exists(target):
+            os.unlink(temporary)
+        else:
+            os.replace(temporary, target)
+    except:
+        if os.path.lexists(temporary):
+            os.unlink(temporary)
+        raise
+
+    return name
+
+
+def _link(source, target):
+    """Makes a file available at a new path.
+
+    The file is hard linked if possible, otherwise cloned, and otherwise
+    copied.
+
+    :param str source: The existing file.
+
+    :param str target: The path at which to make it available.
+    """
+    try:
+        os.link(source, target)
+        return
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+
+    _copy(source, target)
+
+
+def _copy(source, target):
+    """Copies a file, cloning it if the file system supports it.
+
+    :param str source: The existing file.
+
+    :param str target: The path of the copy.
+    """
+    if fcntl is not None:
+        try:
+            with open(source, 'rb') as s, open(target, 'wb') as t:
+                fcntl.ioctl(t.fileno(), FICLONE, s.fileno())
+            shutil.copymode(source, target)
+            return
+        except (IOError, OSError):
+            pass
+
+    shutil.copy2(source, target)
@@ -16,59 +16,122 @@
 # this program. If not, see <http://www.gnu.org/licenses/>.
 """
 This module contains classes for mocking tracebacks.
+
+The source lines of the frames are read through :mod:`linecache` when a
+traceback is formatted, and not when it is created. :mod:`linecache` keeps
+every file loaded, and :mod:`traceback` revalidates the cached lines against
+the size and modification time of the file before using them, so each source
+file is read at most once as long as it is unchanged, and not at all if no
+traceback is formatted.
+
+Frames in files with source maps are mapped back to their sources; see
+:mod:`unittest_jasmine.sourcemap`.
 """
 
-import linecache
 import itertools
 import re
 
+from . import sourcemap
+
 
 class Code(object):
     """A mock code object used in tracebacks.
     """
+    __slots__ = ('co_filename', 'co_name')
+
     def __init__(self, co_filename, co_name):
-        linecache.updatecache(co_filename, None)
         self.co_filename = co_filename
         self.co_name = co_name
 
 
 class Frame(object):
     """A mock frame object used in tracebacks.
+
+    Frames are shared between tracebacks; use :meth:`get` to retrieve the frame
+    for a location.
     """
+    __slots__ = ('f_code', 'f_globals')
+
+    #: The frames created, keyed by ``(co_filename, co_name)``
+    _pool = {}
+
     def __init__(self, f_code):
         self.f_code = f_code
         self.f_globals = {}
 
+    @classmethod
+    def get(self, co_filename, co_name):
+        """Returns the frame for a location, creating it if it does not exist.
+
+        :param str co_filename: The file name.
+
+        :param str co_name: The function name.
+
+        :return: a frame
+        :rtype: Frame
+        """
+        key = (co_filename, co_name)
+        try:
+            return self._pool[key]
+        except KeyError:
+            return self._pool.setdefault(
+                key,
+                self(Code(co_filename, co_name)))
+
 
 class Traceback(object):
     """A mock traceback.
+
+    Every instance is a link in a traceback chain, as for actual tracebacks.
     """
+    __slots__ = ('tb_frame', 'tb_lineno', 'tb_next')
+
     #: The regular expression used to parse a stack entry
     STACK_RE = re.compile(
         r'\s*at\s+([a-zA-Z_][a-zA-Z0-9_.<>]*)\s+\((.*?):([0-9]+):([0-9]+)\)')
 
-    def __init__(self, frames, line_nums):
-        self._frames = frames
-        self._line_nums = line_nums
-        self.tb_frame = self._frames[0]
-        self.tb_lineno = self._line_nums[0]
+    #: The index of the last instruction; this is used by :mod:`traceback` to
+    #: locate the column of the failing expression, and a negative value means
+    #: that it is unknown
+    tb_lasti = -1
 
-    @property
-    def tb_next(self):
-        if len(self._frames) > 1:
-            return Traceback(self._frames[1:], self._line_nums[1:])
+    def __init__(self, tb_frame, tb_lineno, tb_next=None):
+        self.tb_frame = tb_frame
+        self.tb_lineno = tb_lineno
+        self.tb_next = tb_next
 
     @classmethod
     def _frames(self, stack):
-        """Yields all frames and line numbers from a *Jasmine* stack as the
-        tuple ``(frame, line)``.
+        """Yields all frames and locations from a *Jasmine* stack as the tuple
+        ``(frame, line, column)``.
+
+        The locations are those of the generated code.
 
         :param str stack: The stack text.
         """
         for m in self.STACK_RE.finditer(stack):
-            co_name, co_filename, line = m.group(1), m.group(2), m.group(3)
+            co_name, co_filename, line, column = m.groups()
+
+            yield (Frame.get(co_filename, co_name), int(line), int(column))
+
+    @classmethod
+    def _map(self, frame, line, column):
+        """Maps a frame and location to the source of the generated code.
+
+        :param Frame frame: The frame.
+
+        :param int line: The line number.
+
+        :param int column: The column number.
 
-            yield (Frame(Code(co_filename, co_name)), int(line))
+        :return: the tuple ``(frame, line)``, which is ``(frame, line)`` if
+            the file has no source map
+        """
+        location = sourcemap.lookup(frame.f_code.co_filename, line, column)
+        if location is None:
+            return frame, line
+        else:
+            return Frame.get(location[0], frame.f_code.co_name), location[1]
 
     @classmethod
     def _is_user_test(self, frame):
@@ -106,11 +169,46 @@ class Traceback(object):
 
         :param str stack: The *Jasmine* stack description string.
 
-        :return: a mock
+        :return: a mock, or ``None`` if the stack contains no user test frames
         """
-        return self(*zip(*reversed(list(
-            itertools.takewhile(
+        # The stack lists the innermost frame first, so the chain is linked
+        # from its end
+        result = None
+        for frame, line, column in itertools.takewhile(
                 lambda fl: self._is_user_test(fl[0]),
                 itertools.dropwhile(
                     lambda fl: not self._is_user_test(fl[0]),
-                    self._frames(stack)))))))
+                    self._frames(stack))):
+            result = self(*self._map(frame, line, column), tb_next=result)
+        return result
+
+
+class LazyTraceback(Traceback):
+    """A mock traceback created from a *Jasmine* stack trace string only once
+    it is inspected.
+
+    Test results that never format tracebacks thus never parse the stack.
+
+    If the stack contains no user test frames, the traceback consists of a
+    single frame with an unknown location.
+
+    :param str stack: The *Jasmine* stack description string, as passed to
+        :meth:`Traceback.from_stack`.
+    """
+    __slots__ = ('_stack',)
+
+    def __init__(self, stack):
+        self._stack = stack
+
+    def __getattr__(self, name):
+        # This is called only for slots not yet set
+        if name not in Traceback.__slots__ or self._stack is None:
+            raise AttributeError(name)
+
+        tb = Traceback.from_stack(self._stack) or Traceback(
+            Frame.get('<unknown>', '<unknown>'), 0)
+        self._stack = None
+        for slot in Traceback.__slots__:
+            if not hasattr(self, slot):
+                setattr(self, slot, getattr(tb, slot))
+        return getattr(self, name)
@@ -0,0 +1,211 @@
+# coding=utf-8
+# unittest-jasmine
+# Copyright (C) 2015 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+This module records where the time of a test run is spent.
+
+A :class:`Profile` collects, for every spec and suite, the time spent in
+``node``, computed from the times stamped on the runner events, and the time
+spent in *Python* on top of that, split into categories:
+
+``events``
+    Decoding and dispatching the events of the item. The time spent waiting
+    for ``node`` to emit them is not included, since that is the time spent in
+    ``node``.
+
+``lifecycle``
+    Calling the functions of the lifecycle module.
+
+``report``
+    Adding the result to the *unittest* test result, including formatting
+    any tracebacks.
+
+Assign a profile to the :attr:`~unittest_jasmine.unittest.TestItem.profile`
+of a test tree before running it. Once the run has completed, the top level
+suite calls :meth:`Profile.complete`, and :meth:`Profile.report`,
+:meth:`Profile.save` and :meth:`Profile.table` may be used.
+"""
+
+import contextlib
+import json
+import sys
+import time
+
+from . import runner
+
+
+#: The categories of time spent in *Python*
+CATEGORIES = ('events', 'lifecycle', 'report')
+
+
+class Profile(object):
+    """The times recorded for the items of a test run.
+
+    :param str path: The file to which to write the report when the run has
+        completed.
+
+    :param int top: The number of the slowest specs and suites to print to
+        ``stderr`` when the run has completed.
+    """
+    def __init__(self, path=None, top=0):
+        self._path = path
+        self._top = top
+        self._entries = {}
+
+    def _entry(self, item):
+        """Returns the entry for a test tree item, creating it if necessary.
+
+        :param item: The test tree item.
+
+        :return: the entry
+        :rtype: dict
+        """
+        try:
+            return self._entries[item.id]
+        except KeyError:
+            entry = self._entries[item.id] = {
+                'id': item.id,
+                'type': item.TYPE,
+                'name': item.name,
+                'started': None,
+                'node': None,
+                'python': dict((c, 0.0) for c in CATEGORIES)}
+            return entry
+
+    @contextlib.contextmanager
+    def measure(self, item, category):
+        """A context manager adding the time spent in its block to a category
+        of an item.
+
+        :param item: The test tree item.
+
+        :param str category: The category; this is one of
+            :attr:`CATEGORIES`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._entry(item)['python'][category] += \
+                time.perf_counter() - start
+
+    def receive(self, item, started, event):
+        """Records the time spent in *Python* to receive an event.
+
+        Only the time since the event was received from the runner is added to
+        the ``events`` category, so any time spent waiting for ``node`` to
+        emit it is not counted. The time stamped on the event is then recorded
+        using :meth:`event`.
+
+        :param item: The test tree item.
+
+        :param float started: The value of :func:`time.perf_counter` when the
+            event was requested.
+
+        :param dict event: The event.
+        """
+        received = event.get(runner.RECEIVED_KEY, started)
+        self._entry(item)['python']['events'] += \
+            time.perf_counter() - max(started, received)
+        self.event(item, event)
+
+    def event(self, item, event):
+        """Records the time stamped on a runner event.
+
+        The time spent in ``node`` is the time between the *started* and
+        *done* events of an item. If the events have no time, the duration
+        reported by *Jasmine*, if any, is used.
+
+        :param item: The test tree item.
+
+        :param dict event: The event.
+        """
+        entry = self._entry(item)
+        timestamp = event.get('time')
+        if event['event'].endswith('Started'):
+            entry['started'] = timestamp
+        elif entry['started'] is not None and timestamp is not None:
+            entry['node'] = (timestamp - entry['started']) / 1000.0
+        elif event.get('data', {}).get('duration') is not None:
+            entry['node'] = event['data']['duration'] / 1000.0
+
+    def complete(self):
+        """Called when the run has completed.
+
+        This method writes the report and prints the table of the slowest
+        items, if requested.
+        """
+        if self._path:
+            self.save(self._path)
+        if self._top > 0:
+            sys.stderr.write('\n' + self.table(self._top))
+
+    def report(self):
+        """Generates a report of the recorded times.
+
+        :return: a mapping from ``'specs'`` and ``'suites'`` to lists of
+            entries, ordered by decreasing total time; every entry is a
+            ``dict`` with the keys ``'id'``, ``'name'``, ``'node'``, which is
+            the time in ``node`` in seconds, or ``None`` if unknown,
+            ``'python'``, which maps the categories to seconds, and
+            ``'total'``
+        :rtype: dict
+        """
+        result = {'specs': [], 'suites': []}
+        for entry in self._entries.values():
+            python = dict(entry['python'])
+            result[entry['type'] + 's'].append({
+                'id': entry['id'],
+                'name': entry['name'],
+                'node': entry['node'],
+                'python': python,
+                'total': (entry['node'] or 0.0) + sum(python.values())})
+        for entries in result.values():
+            entries.sort(key=lambda e: e['total'], reverse=True)
+        return result
+
+    def save(self, path):
+        """Writes the report as *JSON*.
+
+        :param str path: The file to write.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+    def table(self, count=10):
+        """Formats the slowest specs and suites as a table.
+
+        :param int count: The maximum number of specs and suites to include.
+
+        :return: the table
+        :rtype: str
+        """
+        report = self.report()
+        lines = []
+        for key in ('specs', 'suites'):
+            lines.append('Slowest %s:' % key)
+            lines.append('%10s %10s %10s %10s %10s  %s' % (
+                ('total', 'node') + CATEGORIES + ('name',)))
+            for entry in report[key][:count]:
+                lines.append('%10.3f %10s %10.3f %10.3f %10.3f  %s' % (
+                    (
+                        entry['total'],
+                        '%.3f' % entry['node']
+                        if entry['node'] is not None else '-')
+                    + tuple(entry['python'][c] for c in CATEGORIES)
+                    + (entry['name'],)))
+            lines.append('')
+        return '\n'.join(lines)
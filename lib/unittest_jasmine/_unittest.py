@@ -18,6 +18,9 @@
 This module provides classes to integrate with ``unittest``.
 """
 
+import contextlib
+import sys
+import time
 import unittest
 
 from . import data, tb
@@ -25,13 +28,25 @@ from . import data, tb
 
 class TestItem(object):
     """The base class for all *Jasmine* test items.
+
+    The top level suite and the dotted name of an item are computed once, when
+    first requested, from the cached values of its parent. The tree is built
+    from the leaves up, so they are not known when a suite links its children.
     """
     def __init__(self):
         object.__init__(self)
-        self._parent = self
+        self._link(self)
 
     def __str__(self):
-        return '.'.join(reversed([i.id for i in self.ancestors]))
+        if self._dotted_name is None:
+            parent = self._parent
+            if parent is self:
+                self._dotted_name = ''
+            elif parent._parent is parent:
+                self._dotted_name = self.id
+            else:
+                self._dotted_name = str(parent) + '.' + self.id
+        return self._dotted_name
 
     @property
     def ancestors(self):
@@ -44,19 +59,92 @@ class TestItem(object):
     @property
     def topsuite(self):
         """The top level suite"""
-        result = self
-        while result._parent != result:
-            result = result._parent
-        return result
+        if self._topsuite is None:
+            parent = self._parent
+            self._topsuite = self if parent is self else parent.topsuite
+        return self._topsuite
+
+    def _link(self, parent):
+        """Sets the parent of this item and clears the cached values derived
+        from it.
+
+        :param TestItem parent: The parent suite, or this item for a top level
+            suite.
+        """
+        self._parent = parent
+        self._topsuite = None
+        self._dotted_name = None
 
     @property
     def jasmine(self):
-        """The jasmine runner used by this suite collection"""
+        """The jasmine runner used by this suite collection.
+
+        When set, the event stream is wrapped in a :class:`data.Router`, so
+        that the events may be emitted in any order; the tests are still run
+        and reported in the order of the test tree.
+        """
         return getattr(self.topsuite, '_jasmine', None)
 
     @jasmine.setter
     def jasmine(self, jasmine):
-        self.topsuite._jasmine = jasmine
+        topsuite = self.topsuite
+        if jasmine is not None and not isinstance(jasmine, data.Router):
+            jasmine = data.Router(jasmine, topsuite)
+        topsuite._jasmine = jasmine
+
+    @property
+    def lifecycle(self):
+        """The module receiving lifecycle notifications for this suite
+        collection"""
+        return getattr(self.topsuite, '_lifecycle', None)
+
+    @lifecycle.setter
+    def lifecycle(self, lifecycle):
+        self.topsuite._lifecycle = lifecycle
+
+    @property
+    def profile(self):
+        """The :class:`unittest_jasmine.timing.Profile` recording the times of
+        this suite collection, or ``None``"""
+        return getattr(self.topsuite, '_profile', None)
+
+    @profile.setter
+    def profile(self, profile):
+        self.topsuite._profile = profile
+
+    def _measure(self, category):
+        """Returns a context manager recording the time spent in its block in
+        :attr:`profile`.
+
+        :param str category: The category of the time.
+
+        :return: a context manager
+        """
+        profile = self.profile
+        if profile is None:
+            return contextlib.nullcontext()
+        else:
+            return profile.measure(self, category)
+
+    def _receive(self, jasmine, event):
+        profile = self.profile
+        if profile is None:
+            return super(TestItem, self)._receive(jasmine, event)
+        started = time.perf_counter()
+        result = super(TestItem, self)._receive(jasmine, event)
+        profile.receive(self, started, result)
+        return result
+
+    def _notify(self, name):
+        """Calls a function of the lifecycle module, if it is defined, with
+        this item as argument.
+
+        :param str name: The name of the function.
+        """
+        function = getattr(self.lifecycle, name, None)
+        if function is not None:
+            with self._measure('lifecycle'):
+                function(self)
 
 
 class Test(TestItem, data.JasmineSpec, unittest.TestCase):
@@ -76,18 +164,23 @@ class Test(TestItem, data.JasmineSpec, unittest.TestCase):
     def _add_failures(self, result):
         """Adds all failures from the test run to a test result.
 
-        The failures are taken from :attr:`result`.
+        The failures are taken from :attr:`result`. Any output written by the
+        spec is appended to the failure messages.
 
         :param unittest.TestResult result: The test result to which to add the
             failures.
         """
+        output = self.data.get('output')
         for failure in self.data['failedExpectations']:
+            message = failure['message']
+            if output:
+                message += '\n\nOutput:\n' + output
             result.addFailure(
                 self,
                 err=(
                     AssertionError,
-                    AssertionError(failure['message']),
-                    tb.Traceback.from_stack(failure['stack'])))
+                    AssertionError(message),
+                    tb.LazyTraceback(failure.get('stack') or '')))
 
     def run(self, result=None):
         # Make sure we have a result to run with; this is copied from the
@@ -109,14 +202,30 @@ class Test(TestItem, data.JasmineSpec, unittest.TestCase):
                 self.tearDown()
 
             # Get the test result; if the test passed, we just add success
-            if self.data['status'] == 'passed':
-                result.addSuccess(self)
-            else:
-                self._add_failures(result)
+            with self._measure('report'):
+                if self.data['status'] == 'passed':
+                    result.addSuccess(self)
+                else:
+                    self._add_failures(result)
 
         finally:
             result.stopTest(self)
 
+    def setUp(self):
+        """Called before the test is started.
+
+        By default, this method calls ``test_setup`` of the lifecycle module.
+        """
+        self._notify('test_setup')
+
+    def tearDown(self):
+        """Called when the test has completed.
+
+        By default, this method calls ``test_teardown`` of the lifecycle
+        module.
+        """
+        self._notify('test_teardown')
+
     def shortDescription(self):
         return self.name
 
@@ -127,8 +236,15 @@ class Suite(TestItem, data.JasmineSuite, unittest.TestSuite):
         data.JasmineSuite.__init__(self, children, id, name, description)
         unittest.TestSuite.__init__(self, self.children)
 
+        for child in self.children:
+            child._link(self)
+
+    def announce(self, items):
+        children = super(Suite, self).announce(items)
         for child in children:
-            child._parent = self
+            child._link(self)
+        self.addTests(children)
+        return children
 
     def setUp(self):
         """Called before the suite is started.
@@ -136,9 +252,11 @@ class Suite(TestItem, data.JasmineSuite, unittest.TestSuite):
         Despite the naming convention used, this is not a standard *unittest*
         method; it is added for consistency with :meth:`Test.setUp`.
 
-        By default, this method does nothing; add a replacement if necessary.
+        By default, this method calls ``suite_setup`` of the lifecycle module,
+        unless this is the top level suite; add a replacement if necessary.
         """
-        pass
+        if self.topsuite is not self:
+            self._notify('suite_setup')
 
     def tearDown(self):
         """Called when the suite has completed.
@@ -146,9 +264,12 @@ class Suite(TestItem, data.JasmineSuite, unittest.TestSuite):
         Despite the naming convention used, this is not a standard *unittest*
         method; it is added for consistency with :meth:`Test.tearDown`.
 
-        By default, this method does nothing; add a replacement if necessary.
+        By default, this method calls ``suite_teardown`` of the lifecycle
+        module, unless this is the top level suite; add a replacement if
+        necessary.
         """
-        pass
+        if self.topsuite is not self:
+            self._notify('suite_teardown')
 
     def run(self, result, debug=False):
         self.setUp()
@@ -157,10 +278,73 @@ class Suite(TestItem, data.JasmineSuite, unittest.TestSuite):
             # If this is the top level suite, run the suite outside of the
             # context manager, since it is just a container suite
             if self.topsuite is self:
-                return super(Suite, self).run(result, debug)
+                try:
+                    return super(Suite, self).run(result, debug)
+                finally:
+                    if self.profile is not None:
+                        self.profile.complete()
 
             with self.running(self.jasmine):
                 return super(Suite, self).run(result, debug)
 
         finally:
             self.tearDown()
+
+
+class Placeholder(unittest.TestCase):
+    """A test standing in for the tests of a :class:`DeferredSuite` until they
+    have been loaded.
+
+    :param str name: The name of the deferred tests.
+    """
+    def __init__(self, name):
+        super(Placeholder, self).__init__()
+        self._name = name
+
+    def __str__(self):
+        return self._name
+
+    def id(self):
+        return self._name
+
+    def runTest(self):
+        self.skipTest('not loaded')
+
+
+class DeferredSuite(unittest.TestSuite):
+    """A suite whose tests are loaded when it is first run.
+
+    This allows tests run earlier to proceed while the tests of this suite
+    cannot yet be loaded, and avoids loading them at all if the suite is never
+    run. Until then, the suite contains a single :class:`Placeholder`.
+
+    :param callable load: A function returning the test to add to this suite.
+        This is called once, when the suite is first run. If it raises an
+        exception, the exception is reported as an error of the placeholder.
+
+    :param str name: The name of the placeholder.
+    """
+    def __init__(self, load, name='jasmine'):
+        super(DeferredSuite, self).__init__()
+        self._load = load
+        self._placeholder = Placeholder(name)
+
+    def __iter__(self):
+        if self._load is not None:
+            return iter((self._placeholder,))
+        else:
+            return super(DeferredSuite, self).__iter__()
+
+    def run(self, result, debug=False):
+        if self._load is not None:
+            load, self._load = self._load, None
+            try:
+                self.addTest(load())
+            except Exception:
+                # Report the failure as an error of the placeholder instead of
+                # aborting the entire run
+                result.startTest(self._placeholder)
+                result.addError(self._placeholder, sys.exc_info())
+                result.stopTest(self._placeholder)
+                return result
+        return super(DeferredSuite, self).run(result, debug)
@@ -1,60 +1,585 @@
-// Read command line options
-var projectBaseDir = process.argv[1];
-var options = JSON.parse(process.argv[2]);
-var specFiles = process.argv.slice(3);
+var crypto = require("crypto");
+var fs = require("fs");
+var path = require("path");
 
 
-// Create and initialise a runner
-var jrunner = new (require("jasmine"))({
-    projectBaseDir: projectBaseDir
-});
-jrunner.loadConfig(options);
-jrunner.addSpecFiles(specFiles);
+// The file descriptor to which to write events; if none is passed, which is
+// the case on Windows where a pipe cannot be inherited as a file descriptor,
+// events are written to stdout and other output to stdout goes to stderr
+var eventFd = parseInt(process.env.UNITTEST_JASMINE_EVENT_FD, 10);
+if (isNaN(eventFd)) {
+    eventFd = 1;
+    process.stdout.write = function() {
+        return process.stderr.write.apply(process.stderr, arguments);
+    };
+}
+
+
+// Loads a module as if required from a file in the current directory; this
+// script is run from where it is installed, but Jasmine is installed with the
+// project under test
+function requireFromCwd(name) {
+    var Module = require("module");
+    var base = path.join(process.cwd(), "index.js");
+    if (Module.createRequire) {
+        return Module.createRequire(base)(name);
+    }
+    else {
+        return require(require.resolve(name, {
+            paths: [process.cwd()]
+        }));
+    }
+}
+
+
+// Writes an event object to the event file descriptor as a frame consisting of
+// the length of the payload as a 32 bit big endian integer followed by the
+// payload, which is the event encoded as UTF-8 JSON
+function emit(o) {
+    var payload = Buffer.from(JSON.stringify(o), "utf8");
+    var frame = Buffer.alloc(4 + payload.length);
+    frame.writeUInt32BE(payload.length, 0);
+    payload.copy(frame, 4);
+
+    var offset = 0;
+    while (offset < frame.length) {
+        try {
+            offset += fs.writeSync(eventFd, frame, offset);
+        }
+        catch (e) {
+            if (e.code === "EPIPE") {
+                // The reader has stopped consuming events
+                process.exit(0);
+            }
+            else if (e.code !== "EAGAIN") {
+                throw e;
+            }
+        }
+    }
+}
+
+
+// The CoffeeScript compiler modules, in order of preference
+var COFFEE_SCRIPT_COMPILERS = ["coffee-script", "coffeescript"];
+
+// The file name extensions of CoffeeScript files
+var COFFEE_SCRIPT_EXTENSIONS = [".coffee", ".litcoffee", ".coffee.md"];
+
+
+// Locates the CoffeeScript compiler installed for the project in directory;
+// returns the object {version, load}, where load() loads the compiler, or null
+// if no compiler is installed
+function findCoffeeScript(directory) {
+    var paths = {paths: [directory, process.cwd()]};
+    for (var i = 0; i < COFFEE_SCRIPT_COMPILERS.length; i++) {
+        var name = COFFEE_SCRIPT_COMPILERS[i];
+        var metadata;
+        try {
+            metadata = require.resolve(name + "/package.json", paths);
+        }
+        catch (e) {
+            if (e.code !== "MODULE_NOT_FOUND") {
+                throw e;
+            }
+            continue;
+        }
+        return {
+            version: JSON.parse(fs.readFileSync(metadata, "utf8")).version,
+            load: require.bind(null, path.dirname(metadata))
+        };
+    }
+    return null;
+}
+
+
+// Writes data to file through a temporary file, since concurrent runners may
+// share the cache; failures are ignored
+function writeCache(file, data) {
+    var temporary = file + "." + process.pid + ".tmp";
+    try {
+        fs.mkdirSync(path.dirname(file), {recursive: true});
+        fs.writeFileSync(temporary, data);
+        fs.renameSync(temporary, file);
+    }
+    catch (e) {
+        try {
+            fs.unlinkSync(temporary);
+        }
+        catch (e) {}
+    }
+}
+
 
+// Registers a require hook compiling CoffeeScript files, and storing the
+// compiled code in cacheDir keyed by the compiler version and the source, so
+// that unchanged files are never compiled again; the compiler is loaded only
+// when a file must be compiled
+//
+// The source map of the compiled code is stored next to it as KEY.map, and
+// the file maps/SHA1 in cacheDir, where SHA1 is the hash of the source file
+// name, contains the key of the code last loaded for the file, so that stack
+// traces can be mapped back to the source
+//
+// The hook is not installed for extensions already handled by another hook,
+// and a hook registered later, such as by require("coffee-script/register") in
+// a helper file, replaces it; only hooks installed by this function are
+// replaced, since a long-lived runner calls it for every request
+function registerCoffeeScript(cacheDir, directory) {
+    var installed;
+    var compiler = null;
 
-// Remove default logging
-jrunner.configureDefaultReporter({
-    print: function() {}
+    function compile(module, filename) {
+        var source = fs.readFileSync(filename, "utf8").replace(/^\uFEFF/, "");
+        var literate = /\.(litcoffee|coffee\.md)$/.test(filename);
+        if (installed === undefined) {
+            installed = findCoffeeScript(directory);
+        }
+        if (!installed) {
+            throw new Error("No CoffeeScript compiler found for " + filename);
+        }
+
+        var key = crypto.createHash("sha1")
+            .update(JSON.stringify([installed.version, literate, source]))
+            .digest("hex");
+        var cached = path.join(cacheDir, key + ".js");
+        var code;
+        try {
+            code = fs.readFileSync(cached, "utf8");
+        }
+        catch (e) {
+            if (!compiler) {
+                // The compiler may replace the stack trace formatting to map
+                // the frames of compiled files to their sources; the frames
+                // are mapped using the stored source maps instead, so keep
+                // the current formatting to not map them twice
+                var prepareStackTrace = Error.prepareStackTrace;
+                compiler = installed.load();
+                Error.prepareStackTrace = prepareStackTrace;
+            }
+            var result = compiler.compile(source, {
+                filename: filename,
+                literate: literate,
+                sourceMap: true
+            });
+            if (typeof result === "string") {
+                code = result;
+            }
+            else {
+                code = result.js;
+                if (result.v3SourceMap) {
+                    writeCache(
+                        path.join(cacheDir, key + ".map"),
+                        result.v3SourceMap);
+                }
+            }
+            writeCache(cached, code);
+        }
+
+        var pointer = path.join(
+            cacheDir,
+            "maps",
+            crypto.createHash("sha1").update(filename).digest("hex"));
+        var previous = null;
+        try {
+            previous = fs.readFileSync(pointer, "utf8");
+        }
+        catch (e) {}
+        if (previous !== key) {
+            writeCache(pointer, key);
+        }
+
+        module._compile(code, filename);
+    }
+
+    compile.compileCache = true;
+    COFFEE_SCRIPT_EXTENSIONS.forEach(function(extension) {
+        var registered = require.extensions[extension];
+        if (!registered || registered.compileCache) {
+            require.extensions[extension] = compile;
+        }
+    });
+}
+
+
+// Output written to stdout and stderr while a spec is running is captured
+// here instead of being written, and attached to the specDone event
+var capturedOutput = null;
+["stdout", "stderr"].forEach(function(name) {
+    var stream = process[name];
+    var write = stream.write;
+    stream.write = function(chunk, encoding, callback) {
+        if (capturedOutput === null) {
+            return write.apply(stream, arguments);
+        }
+
+        capturedOutput.push(chunk.toString());
+        if (typeof encoding === "function") {
+            encoding();
+        }
+        else if (typeof callback === "function") {
+            callback();
+        }
+        return true;
+    };
 });
 
 
-// Add a custom reporter
-reporter = {};
-["suiteStarted", "suiteDone", "specStarted", "specDone"].forEach(
-    function(event) {
-        reporter[event] = function(data) {
-            console.log(JSON.stringify({
-                event: event,
-                data: data
-            }));
+// The functions defining suites and specs
+var DEFINITIONS = ["describe", "xdescribe", "fdescribe", "it", "xit", "fit"];
+
+
+// Replaces the global functions defining suites and specs with functions that
+// record the line in file at which every item is defined, as returned by
+// file(), in locations
+function recordLocations(file, locations) {
+    DEFINITIONS.forEach(function(name) {
+        var define = global[name];
+        if (typeof define !== "function") {
+            return;
+        }
+
+        global[name] = function() {
+            var item = define.apply(this, arguments);
+            var current = file();
+            var frames = (new Error().stack || "").split("\n");
+            for (var i = 0; i < frames.length; i++) {
+                var match = /\(?([^()\s]+):(\d+):\d+\)?$/.exec(frames[i]);
+                if (match && match[1] === current) {
+                    locations.push({
+                        item: item,
+                        file: current,
+                        line: parseInt(match[2], 10)
+                    });
+                    break;
+                }
+            }
+            return item;
         };
     });
-jrunner.jasmine.getEnv().addReporter(reporter);
+}
+
+
+// Resolves locations on the form "file:line" to the IDs of the items defined
+// closest before that line in the file, using the definitions recorded by
+// recordLocations
+function locate(requested, definitions, specDir) {
+    var result = {};
+    requested.forEach(function(location) {
+        var separator = location.lastIndexOf(":");
+        var file = path.resolve(specDir, location.substring(0, separator));
+        var line = parseInt(location.substring(separator + 1), 10);
+        var best = null;
+        definitions.forEach(function(definition) {
+            if (definition.file === file && definition.line <= line
+                    && (!best || definition.line > best.line)) {
+                best = definition;
+            }
+        });
+        if (best) {
+            result[best.item.id] = true;
+        }
+    });
+    return result;
+}
+
 
+// Marks the specs selected by a filter, and the suites containing them, as
+// included; returns whether item is included
+//
+// A spec is selected if its full name matches filter.pattern, if its ID or the
+// ID of a suite containing it is in filter.ids, and if it or a suite
+// containing it is in filter.located; criteria not set are ignored
+function select(item, filter, included, matched) {
+    matched = {
+        ids: matched.ids || !!(filter.ids && filter.ids[item.id]),
+        located: matched.located || !!(filter.located
+            && filter.located[item.id])
+    };
+
+    var result = false;
+    if (item.children) {
+        item.children.forEach(function(child) {
+            if (select(child, filter, included, matched)) {
+                result = true;
+            }
+        });
+    }
+    else {
+        result = (!filter.pattern || filter.pattern.test(item.result.fullName))
+            && (!filter.ids || matched.ids)
+            && (!filter.located || matched.located);
+    }
 
-// Load helpers and specs
-jrunner.loadHelpers();
-jrunner.loadSpecs();
+    if (result) {
+        included[item.id] = true;
+    }
+    return result;
+}
 
 
-// Print the test tree before actually running the tests
-console.log(JSON.stringify((function mapTest(item) {
+// Maps a test tree item to the data sent to Python; if depth is 0, the
+// children of suites are not included, and if included is not null, only the
+// children it contains are included
+function mapTest(item, specFileNames, depth, included) {
     var data = {
         id: item.id,
         fullName: item.result.fullName,
         description: item.description
     };
 
+    if (specFileNames[item.id]) {
+        data.file = specFileNames[item.id];
+    }
+
     if (item.children) {
         data.type = "suite";
-        data.children = item.children.map(mapTest);
+        if (depth !== 0) {
+            data.children = mapChildren(
+                item, specFileNames, depth - 1, included);
+        }
     }
     else {
         data.type = "spec";
     }
 
     return data;
-})(jrunner.env.topSuite())));
+}
+
+
+// Maps the children of a suite to the data sent to Python; see mapTest
+function mapChildren(item, specFileNames, depth, included) {
+    return item.children
+        .filter(function(child) {
+            return !included || included[child.id];
+        })
+        .map(function(child) {
+            return mapTest(child, specFileNames, depth, included);
+        });
+}
+
+
+// Runs the specs described by a request object and calls done once all specs
+// have completed; if done is not passed, the process exits once all specs have
+// completed
+//
+// If request.stream is set, the test tree initially contains only the top
+// level items, and the children of every suite are instead sent with its
+// suiteStarted event
+//
+// If request.filter is set, only the specs it selects are run; the test tree
+// contains only those specs and the suites containing them, and no events are
+// sent for other items; the filter may contain a regular expression matched
+// against the full names of specs as pattern, a list of item IDs as ids and a
+// list of locations on the form "file:line" as locations, where file is
+// relative to the spec directory; see select
+function run(request, done) {
+    var projectBaseDir = request.projectBaseDir;
+    var options = request.options;
+    var specFiles = request.specFiles;
+    var suites = {};
+    var specFileNames = {};
+    var included = null;
+
+
+    // Create and initialise a runner
+    var jrunner = new (requireFromCwd("jasmine"))({
+        projectBaseDir: projectBaseDir
+    });
+    jrunner.loadConfig(options);
+    jrunner.addSpecFiles(specFiles);
+
+
+    // Remove default logging
+    jrunner.configureDefaultReporter({
+        print: function() {}
+    });
+
+
+    // Add a custom reporter; specDone events always include the duration of
+    // the spec in milliseconds, and any output captured while it was running,
+    // and every event has the time at which it was reported, in milliseconds
+    // since the epoch
+    var specStartTimes = {};
+    var reporter = {};
+    ["suiteStarted", "suiteDone", "specStarted", "specDone"].forEach(
+        function(event) {
+            reporter[event] = function(data) {
+                if (included && !included[data.id]) {
+                    return;
+                }
+                else if (event === "specStarted") {
+                    specStartTimes[data.id] = Date.now();
+                    capturedOutput = [];
+                }
+                else if (event === "specDone") {
+                    if (data.duration === undefined) {
+                        data.duration = Date.now() - specStartTimes[data.id];
+                    }
+                    if (capturedOutput && capturedOutput.length) {
+                        data.output = capturedOutput.join("");
+                    }
+                    capturedOutput = null;
+                }
+                else if (event === "suiteStarted" && request.stream) {
+                    data = Object.assign({}, data, {
+                        children: mapChildren(
+                            suites[data.id], specFileNames, 0, included)
+                    });
+                }
+                emit({
+                    event: event,
+                    data: data,
+                    time: Date.now()
+                });
+            };
+        });
+    if (done) {
+        reporter.jasmineDone = function() {
+            setImmediate(done);
+        };
+        jrunner.exitOnCompletion = false;
+        jrunner.onComplete(function() {});
+    }
+    jrunner.jasmine.getEnv().addReporter(reporter);
+
+
+    // Load helpers and specs; the specs are loaded one file at a time to
+    // record the file defining each top level item
+    var specDir = path.resolve(projectBaseDir, options.spec_dir);
+    if (request.compileCache) {
+        registerCoffeeScript(request.compileCache, specDir);
+    }
+    jrunner.loadHelpers();
+    var filter = request.filter;
+    var currentFile = null;
+    var definitions = [];
+    if (filter && filter.locations) {
+        recordLocations(function() { return currentFile; }, definitions);
+    }
+    jrunner.specFiles.forEach(function(file) {
+        var topChildren = jrunner.env.topSuite().children;
+        var count = topChildren.length;
+        currentFile = file;
+        require(file);
+        topChildren.slice(count).forEach(function(item) {
+            specFileNames[item.id] = path.relative(specDir, file);
+        });
+    });
+
+
+    // Select the specs to run
+    if (filter) {
+        var ids = null;
+        if (filter.ids) {
+            ids = {};
+            filter.ids.forEach(function(id) {
+                ids[id] = true;
+            });
+        }
+
+        included = {};
+        select(jrunner.env.topSuite(), {
+            pattern: filter.pattern ? new RegExp(filter.pattern) : null,
+            ids: ids,
+            located: filter.locations
+                ? locate(filter.locations, definitions, specDir)
+                : null
+        }, included, {});
+        var specFilter = function(spec) {
+            return included[spec.id] === true;
+        };
+        if (jrunner.env.configure) {
+            jrunner.env.configure({specFilter: specFilter});
+        }
+        else {
+            // Jasmine before 3.3 has no configure method
+            jrunner.env.specFilter = specFilter;
+        }
+    }
+
+
+    // Print the test tree before actually running the tests
+    if (request.stream) {
+        (function index(item) {
+            if (item.children) {
+                suites[item.id] = item;
+                item.children.forEach(index);
+            }
+        })(jrunner.env.topSuite());
+        emit(mapTest(jrunner.env.topSuite(), specFileNames, 1, included));
+    }
+    else {
+        emit(mapTest(jrunner.env.topSuite(), specFileNames, -1, included));
+    }
+
+
+    jrunner.execute();
+}
+
+
+// Removes all modules not loaded from node_modules from the module cache, so
+// that spec and helper files are evaluated again by the next run
+function purgeModuleCache() {
+    var separator = path.sep + "node_modules" + path.sep;
+    Object.keys(require.cache).forEach(function(name) {
+        if (name.indexOf(separator) < 0) {
+            delete require.cache[name];
+        }
+    });
+}
+
+
+// Serves requests read from stdin, one JSON object per line, until stdin is
+// closed; every run is terminated by a jasmineDone event
+function serve() {
+    var requests = [];
+    var running = false;
+    var closed = false;
+
+    function next() {
+        if (running) {
+            return;
+        }
+        else if (requests.length) {
+            running = true;
+            run(requests.shift(), function() {
+                emit({event: "jasmineDone"});
+                purgeModuleCache();
+                running = false;
+                next();
+            });
+        }
+        else if (closed) {
+            process.exit(0);
+        }
+    }
+
+    // Load Jasmine before the first request arrives
+    requireFromCwd("jasmine");
+
+    var lines = require("readline").createInterface({
+        input: process.stdin
+    });
+    lines.on("line", function(line) {
+        if (line.trim()) {
+            requests.push(JSON.parse(line));
+            next();
+        }
+    });
+    lines.on("close", function() {
+        closed = true;
+        next();
+    });
+}
 
 
-jrunner.execute();
+// Without command line arguments we serve requests from stdin, otherwise the
+// first argument is the name of a file containing the request for a single
+// run, or "-" to read it from stdin
+if (process.argv.length < 3) {
+    serve();
+}
+else {
+    var source = process.argv[2];
+    run(JSON.parse(fs.readFileSync(source === "-" ? 0 : source, "utf8")));
+}
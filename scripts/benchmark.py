@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+"""Benchmarks for the *Python* side of *unittest-jasmine*.
+
+Run this script with the name of a benchmark and its arguments::
+
+    python scripts/benchmark.py memory BASELINE [SPECS]
+    python scripts/benchmark.py overhead [SPECS] [DEPTH]
+    python scripts/benchmark.py discovery [FILES]
+    python scripts/benchmark.py tracebacks [FAILURES] [DEPTH]
+
+The benchmarks use synthetic test trees and events, so neither ``node`` nor
+*Jasmine* is run.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+import unittest
+
+from unittest import mock
+
+#: The environment variable used to select the library directory to benchmark
+LIBRARY_VARIABLE = 'UNITTEST_JASMINE_BENCHMARK_LIBRARY'
+
+sys.path.insert(0, os.environ.get(LIBRARY_VARIABLE) or os.path.join(
+    os.path.dirname(__file__),
+    os.pardir,
+    'lib'))
+
+import unittest_jasmine
+
+
+def generate_tree(specs, width=10, depth=3):
+    """Generates a test tree, as output by ``runner.js``.
+
+    :param int specs: The number of specs.
+
+    :param int width: The number of children of every suite.
+
+    :param int depth: The number of suite levels below every top level suite.
+
+    :return: the tree
+    :rtype: dict
+    """
+    counters = {'suite': 0, 'spec': 0}
+
+    def item(type, parent_name, description):
+        counters[type] += 1
+        return {
+            'type': type,
+            'id': '%s%d' % (type, counters[type]),
+            'fullName': ('%s %s' % (parent_name, description)).strip(),
+            'description': description}
+
+    def suite(parent_name, description, level):
+        result = item('suite', parent_name, description)
+        result['children'] = []
+        for i in range(width):
+            if counters['spec'] >= specs:
+                break
+            elif level < depth:
+                result['children'].append(suite(
+                    result['fullName'], 'suite %d' % i, level + 1))
+            else:
+                result['children'].append(item(
+                    'spec', result['fullName'], 'does thing %d' % i))
+        return result
+
+    tree = item('suite', '', 'Jasmine__TopLevel__Suite')
+    tree['children'] = []
+    while counters['spec'] < specs:
+        tree['children'].append(suite(
+            '', 'Suite %d' % len(tree['children']), 0))
+    return tree
+
+
+def generate_events(tree, passed=False):
+    """Generates the events of a test run for a test tree.
+
+    Every spec has one passed expectation, and unless ``passed`` is set, one
+    failed expectation.
+
+    :param dict tree: The test tree.
+
+    :param bool passed: Whether the specs pass.
+    """
+    for child in tree['children']:
+        for event in _generate_item_events(child, passed):
+            yield event
+
+
+def _generate_item_events(item, passed):
+    base = {
+        'id': item['id'],
+        'description': item['description'],
+        'fullName': item['fullName']}
+    if item['type'] == 'suite':
+        yield {'event': 'suiteStarted', 'data': dict(base)}
+        for child in item['children']:
+            for event in _generate_item_events(child, passed):
+                yield event
+        yield {'event': 'suiteDone', 'data': dict(base, status='finished')}
+    else:
+        yield {'event': 'specStarted', 'data': dict(base)}
+        yield {'event': 'specDone', 'data': dict(
+            base,
+            status='passed' if passed else 'failed',
+            duration=1,
+            passedExpectations=[{
+                'matcherName': 'toEqual',
+                'message': 'Passed.',
+                'stack': '',
+                'passed': True}],
+            failedExpectations=[] if passed else [{
+                'matcherName': 'toEqual',
+                'message': 'Expected 2 to equal 1.',
+                'stack': 'Error: Expected 2 to equal 1.\n'
+                '    at stack (jasmine.js:1482:17)',
+                'passed': False,
+                'expected': 1,
+                'actual': 2}])}
+
+
+def run(item, events):
+    """Runs a test tree item using a stream of events without *unittest*.
+
+    :param item: The item to run.
+
+    :param events: The event generator.
+    """
+    with item.running(events):
+        for child in getattr(item, 'children', []):
+            run(child, events)
+
+
+def measure(function):
+    """Measures the memory allocated by a function and still in use after it
+    has returned.
+
+    :param callable function: The function to call.
+
+    :return: the tuple ``(value, size)``, where ``value`` is the return value
+        of ``function`` and ``size`` the size in bytes
+    """
+    tracemalloc.start()
+    try:
+        value = function()
+        size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, size
+
+
+def memory(baseline, specs=80000):
+    """Measures the memory used to hold a test tree and its results.
+
+    The sizes are reported per spec for the test tree parsed as plain data and
+    as *unittest* items, and for the results kept by the items compared to the
+    full result events.
+
+    Every size is measured in a fresh process, both for the library in the
+    working tree and for the library at the *git* revision ``baseline``, so
+    that neither measurement is affected by the other.
+
+    :param str baseline: The revision to compare with; this is typically the
+        revision before the changes being evaluated, not ``HEAD``.
+
+    :param int specs: The number of specs to generate.
+    """
+    specs = int(specs)
+    root = tempfile.mkdtemp()
+    try:
+        # Export the library at the baseline revision
+        top = os.path.join(os.path.dirname(__file__), os.pardir)
+        archive = subprocess.Popen(
+            ['git', 'archive', baseline, 'lib'],
+            cwd=top,
+            stdout=subprocess.PIPE)
+        subprocess.check_call(['tar', '-x', '-C', root], stdin=archive.stdout)
+        if archive.wait() != 0:
+            raise RuntimeError('Failed to export revision %s' % baseline)
+
+        libraries = (
+            os.path.join(root, 'lib'),
+            os.path.join(top, 'lib'))
+
+        def size(name, library):
+            return int(subprocess.check_output(
+                [sys.executable, __file__, '_memory', name, str(specs)],
+                env=dict(os.environ, **{LIBRARY_VARIABLE: library})))
+
+        print('Specs:                     %d' % specs)
+        print('%-26s %12s %12s' % ('bytes/spec:', baseline, 'working tree'))
+        for name, title in (
+                ('data', 'Data tree'),
+                ('unittest', 'unittest tree'),
+                ('results', 'Kept results'),
+                ('events', 'Full result events')):
+            print('%-26s %12d %12d' % ((title + ':',) + tuple(
+                size(name, library) // specs
+                for library in libraries)))
+
+    finally:
+        shutil.rmtree(root)
+
+
+def _memory(name, specs):
+    """Measures the memory used by one of the structures compared by
+    :func:`memory` and prints the size.
+
+    :param str name: The name of the structure: ``'data'``, ``'unittest'``,
+        ``'results'`` or ``'events'``.
+
+    :param int specs: The number of specs to generate.
+    """
+    specs = int(specs)
+    encoded_tree = json.dumps(generate_tree(specs))
+    encoded_events = [
+        json.dumps(event)
+        for event in generate_events(json.loads(encoded_tree))]
+
+    def parse(**kwargs):
+        return lambda: unittest_jasmine.data.parse(
+            json.loads(encoded_tree), **kwargs)
+
+    def results(tree):
+        def inner():
+            run_events = (json.loads(e) for e in encoded_events)
+            for child in tree.children:
+                run(child, run_events)
+        return inner
+
+    def full_results():
+        return [
+            event
+            for event in (json.loads(e) for e in encoded_events)
+            if event['event'].endswith('Done')]
+
+    if name == 'data':
+        _, size = measure(parse())
+    elif name == 'unittest':
+        _, size = measure(parse(
+            spec=unittest_jasmine.unittest.Test,
+            suite=unittest_jasmine.unittest.Suite))
+    elif name == 'results':
+        _, size = measure(results(parse()()))
+    elif name == 'events':
+        _, size = measure(full_results)
+    else:
+        raise RuntimeError('Unknown structure: %s' % name)
+    print(size)
+
+
+def overhead(specs=20000, depth=20):
+    """Measures the time spent by the *unittest* items per test.
+
+    The tree is made deep and narrow, so that any work proportional to the
+    depth of a test is visible.
+
+    :param int specs: The number of specs to generate.
+
+    :param int depth: The number of suite levels below every top level suite.
+    """
+    specs = int(specs)
+    depth = int(depth)
+    tree_data = generate_tree(specs, width=2, depth=depth)
+    events = list(generate_events(tree_data, passed=True))
+
+    def timed(function):
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+
+    tree = unittest_jasmine.data.parse(
+        tree_data,
+        spec=unittest_jasmine.unittest.Test,
+        suite=unittest_jasmine.unittest.Suite)
+    tests = []
+
+    def collect(item):
+        if isinstance(item, unittest.TestCase):
+            tests.append(item)
+        for child in getattr(item, 'children', []):
+            collect(child)
+    collect(tree)
+
+    def run_tree():
+        tree.jasmine = iter(events)
+        tree.run(unittest.TestResult())
+
+    def access():
+        for test in tests:
+            str(test)
+            test.topsuite
+            test.jasmine
+
+    durations = (
+        ('Run', timed(run_tree)),
+        ('Name, top suite, runner', timed(access)))
+
+    print('Specs:                     %d' % len(tests))
+    print('Depth:                     %d' % (depth + 2))
+    for name, duration in durations:
+        print('%-26s %6.2f µs/spec' % (
+            name + ':', 1000000 * duration / len(tests)))
+
+
+def discovery(files=20000):
+    """Measures the time taken to find spec files in a large directory tree.
+
+    The files are spread over directories of 20 files each, and the
+    directories are made old enough for their listings to be cached.
+
+    :param int files: The number of files to generate.
+    """
+    files = int(files)
+    root = tempfile.mkdtemp()
+    environment = mock.patch.dict(os.environ, {
+        unittest_jasmine.cache.ENVIRONMENT_VARIABLE:
+            os.path.join(root, 'cache')})
+    environment.start()
+    try:
+        directory = os.path.join(root, 'spec')
+        for i in range(files):
+            path = os.path.join(
+                directory, 'group%d' % (i // 400), 'suite%d' % (i // 20))
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            with open(os.path.join(path, 'spec%d.js' % i), 'w'):
+                pass
+        past = time.time() - 60
+        for path, dirs, names in os.walk(directory):
+            os.utime(path, (past, past))
+
+        def timed(function):
+            start = time.perf_counter()
+            function()
+            return time.perf_counter() - start
+
+        durations = (
+            ('os.walk', timed(lambda: list(os.walk(directory)))),
+            ('Cold', timed(lambda: unittest_jasmine.discovery.find(
+                directory, ['**/*.js']))),
+            ('Warm', timed(lambda: unittest_jasmine.discovery.find(
+                directory, ['**/*.js']))))
+
+        print('Files:                     %d' % files)
+        for name, duration in durations:
+            print('%-26s %6.1f ms' % (name + ':', 1000 * duration))
+
+    finally:
+        environment.stop()
+        shutil.rmtree(root)
+
+
+def tracebacks(failures=2000, depth=50):
+    """Measures the time taken to create and format mock tracebacks.
+
+    Every failure has the same stack, as is the case for failures from a
+    shared helper function.
+
+    :param int failures: The number of failures.
+
+    :param int depth: The number of user frames of every stack.
+    """
+    failures = int(failures)
+    depth = int(depth)
+    stack = 'Error: Expected 2 to equal 1.\n' + ''.join(
+        '    at func%d (%s:%d:1)\n' % (i, __file__, i + 1)
+        for i in range(depth))
+
+    def timed(function):
+        start = time.perf_counter()
+        value = function()
+        return value, time.perf_counter() - start
+
+    tbs, create = timed(lambda: [
+        unittest_jasmine.tb.Traceback.from_stack(stack)
+        for i in range(failures)])
+    _, walk = timed(lambda: [
+        traceback.extract_tb(tb)
+        for tb in tbs])
+
+    print('Failures:                  %d' % failures)
+    print('Depth:                     %d' % depth)
+    for name, duration in (
+            ('Create', create),
+            ('Extract', walk)):
+        print('%-26s %6.2f µs/failure' % (
+            name + ':', 1000000 * duration / failures))
+
+
+#: The available benchmarks
+BENCHMARKS = {
+    '_memory': _memory,
+    'discovery': discovery,
+    'memory': memory,
+    'overhead': overhead,
+    'tracebacks': tracebacks}
+
+
+def main(name, *args):
+    try:
+        benchmark = BENCHMARKS[name]
+    except KeyError:
+        raise RuntimeError('Unknown benchmark: %s' % name)
+    benchmark(*args)
+
+
+if __name__ == '__main__':
+    try:
+        main(*sys.argv[1:])
+    except (RuntimeError, TypeError) as e:
+        sys.stderr.write('%s\n' % e)
+        sys.stderr.write('Usage: %s %s\n' % (
+            sys.argv[0],
+            '|'.join(sorted(
+                name for name in BENCHMARKS if not name.startswith('_')))))
+        sys.exit(1)
@@ -66,6 +66,7 @@ setuptools.setup(
     description='A unittest test loader for Jasmine tests',
     long_description=README + '\n\n' + CHANGES,
 
+    python_requires='>=3.7',
     install_requires=RUNTIME_PACKAGES,
     setup_requires=RUNTIME_PACKAGES + SETUP_PACKAGES,
 
@@ -14,3 +14,18 @@
 #
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from . import _res as res
+
+
+class CacheTestCase(unittest.TestCase):
+    """A test case pointing the cache at a temporary directory, so that tests
+    neither depend on nor modify the cache of the user.
+    """
+    def setUp(self):
+        super(CacheTestCase, self).setUp()
+
+        #: The temporary directory containing the cache
+        self.cache_root = res.temporary_cache(self)
@@ -1,6 +1,10 @@
 import os
+import shutil
+import tempfile
 import unittest_jasmine
 
+from unittest import mock
+
 
 #: The expected output from the test
 TEST_OUTPUT = (
@@ -74,3 +78,20 @@ def output(path='test-runner.js', **options):
         os.path.dirname(__file__),
         os.path.join('res', path),
         **options)
+
+
+def temporary_cache(test):
+    """Points the cache at a temporary directory for the duration of a test.
+
+    :param unittest.TestCase test: The test case.
+
+    :return: the temporary directory containing the cache
+    """
+    root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, root)
+    environment = mock.patch.dict(os.environ, {
+        unittest_jasmine.cache.ENVIRONMENT_VARIABLE:
+            os.path.join(root, 'cache')})
+    environment.start()
+    test.addCleanup(environment.stop)
+    return root
@@ -3,13 +3,25 @@ import unittest
 
 import unittest_jasmine
 
-from . import _res as res
+from . import CacheTestCase, _res as res
 
 spec = unittest_jasmine.data.JasmineSpec
 suite = unittest_jasmine.data.JasmineSuite
 
 
-class JasmineDataTest(unittest.TestCase):
+class custom_spec(spec):
+    """A spec allowing tests to add attributes.
+    """
+    __slots__ = ('kwargs', 'load')
+
+
+class custom_suite(suite):
+    """A suite allowing tests to add attributes.
+    """
+    __slots__ = ('kwargs', 'load')
+
+
+class JasmineDataTest(CacheTestCase):
     def suite(self, spec=spec, suite=suite):
         return suite(
                 [
@@ -67,12 +79,12 @@ class JasmineDataTest(unittest.TestCase):
         """Tests that passing custom generator functions returns the expected
         value"""
         def test_spec(id, name, description, **kwargs):
-            s = spec(id, name, description)
+            s = custom_spec(id, name, description)
             s.kwargs = kwargs
             return s
 
         def test_suite(children, id, name, description, **kwargs):
-            s = suite(children, id, name, description)
+            s = custom_suite(children, id, name, description)
             s.kwargs = kwargs
             return s
 
@@ -83,7 +95,7 @@ class JasmineDataTest(unittest.TestCase):
             test=True,
             test_name='test')
 
-        self.assertEqual(self.suite(), data)
+        self.assertEqual(self.suite(custom_spec, custom_suite), data)
 
         def visitor(i):
             self.assertTrue(i.kwargs['test'])
@@ -113,7 +125,7 @@ class JasmineDataTest(unittest.TestCase):
             def load(self):
                 expect('specStarted', self.id)
                 expect('specDone', self.id)
-            s = spec(id, name, description)
+            s = custom_spec(id, name, description)
             s.load = types.MethodType(load, s)
             return s
 
@@ -123,7 +135,7 @@ class JasmineDataTest(unittest.TestCase):
                 for child in children:
                     child.load()
                 expect('suiteDone', self.id)
-            s = suite(children, id, name, description)
+            s = custom_suite(children, id, name, description)
             s.load = types.MethodType(load, s)
             return s
 
@@ -143,6 +155,88 @@ class JasmineDataTest(unittest.TestCase):
         for i in unittest_jasmine.data.parse(tree).children:
             self.running(i, output)
 
+    def test_running_stream(self):
+        """Asserts that running works with a streamed test tree"""
+        output = res.output(stream=True)
+        tree = unittest_jasmine.data.parse(next(output))
+        self.assertTrue(tree.children[0].pending)
+        self.assertEqual([], tree.children[0].children)
+
+        # The top-level suite is not run
+        for i in tree.children:
+            self.running(i, output)
+
+        self.assertEqual(
+            unittest_jasmine.data.parse(next(res.output())),
+            tree)
+
+    def test_result_trimmed(self):
+        """Asserts that only the fields needed to report the result are kept"""
+        output = res.output()
+        tree = unittest_jasmine.data.parse(next(output))
+        for i in tree.children:
+            self.running(i, output)
+
+        spec = tree.children[0].children[0]
+        self.assertEqual(
+            {'status', 'failedExpectations', 'duration'},
+            set(spec.result['data']))
+        self.assertEqual(
+            [{'message', 'stack'}],
+            [set(f) for f in spec.result['data']['failedExpectations']])
+
+    def test_find(self):
+        """Asserts that items are found by ID"""
+        tree = unittest_jasmine.data.parse(res.SUITE_DEFINITION)
+        self.assertEqual('Spec 1', tree.find('spec1').name)
+        self.assertEqual('Suite 1', tree.find('suite1').name)
+        self.assertIsNone(tree.find('__invalid_id__'))
+        self.assertEqual('Spec 1', tree.children[0].find('spec1').name)
+
+    def test_running_routed(self):
+        """Asserts that running works with events in reverse order"""
+        output = res.output()
+        tree = unittest_jasmine.data.parse(next(output))
+        router = unittest_jasmine.data.Router(reversed(list(output)), tree)
+
+        # The top-level suite is not run
+        for i in tree.children:
+            self.running(i, router)
+        self.assertEqual(0, router.pending)
+
+    def test_running_routed_stream(self):
+        """Asserts that running works with events out of order with a
+        streamed test tree"""
+        output = res.output(stream=True)
+        tree = unittest_jasmine.data.parse(next(output))
+
+        # The children of a suite are announced when it is started, so
+        # suiteStarted events must precede the events of the children
+        events = list(output)
+        started = [e for e in events if e['event'] == 'suiteStarted']
+        router = unittest_jasmine.data.Router(
+            started + list(reversed([e for e in events if e not in started])),
+            tree)
+
+        # The top-level suite is not run
+        for i in tree.children:
+            self.running(i, router)
+        self.assertEqual(0, router.pending)
+        self.assertEqual(
+            unittest_jasmine.data.parse(next(res.output())),
+            tree)
+
+    def test_running_routed_unknown(self):
+        """Asserts that routing fails for events of unknown items"""
+        output = res.output()
+        tree = unittest_jasmine.data.parse(next(output))
+        router = unittest_jasmine.data.Router(
+            [{'event': 'specDone', 'data': {'id': '__invalid_id__'}}],
+            tree)
+
+        with self.assertRaises(RuntimeError):
+            self.running(tree.children[0], router)
+
     def test_running_invalid(self):
         """Asserts that running fails with incorrect data"""
         output = res.output()
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from unittest import mock
+
+import unittest_jasmine
+
+
+class DiscoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        environment = mock.patch.dict(os.environ, {
+            unittest_jasmine.cache.ENVIRONMENT_VARIABLE: os.path.join(
+                self.root, 'cache')})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.directory = os.path.join(self.root, 'spec')
+        for path in (
+                'a-spec.js',
+                'helper.js',
+                'inner/b-spec.js',
+                'inner/deeper/c-spec.js',
+                'fixtures/d-spec.js',
+                'node_modules/package/e-spec.js',
+                '.hidden/h-spec.js'):
+            self.touch(path)
+
+    def touch(self, path):
+        """Creates an empty file in the spec directory.
+
+        :param str path: The path of the file, relative to the spec directory.
+        """
+        path = os.path.join(self.directory, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w'):
+            pass
+
+    def test_find(self):
+        """Tests that all files not in node_modules or hidden directories are
+        found by default"""
+        self.assertEqual(
+            [
+                'a-spec.js',
+                'fixtures/d-spec.js',
+                'helper.js',
+                'inner/b-spec.js',
+                'inner/deeper/c-spec.js'],
+            unittest_jasmine.discovery.find(self.directory))
+
+    def test_find_patterns(self):
+        """Tests that include and exclude patterns are applied"""
+        self.assertEqual(
+            [
+                '.hidden/h-spec.js',
+                'a-spec.js',
+                'inner/b-spec.js',
+                'inner/deeper/c-spec.js'],
+            unittest_jasmine.discovery.find(
+                self.directory,
+                ['**/*-spec.js'],
+                ['fixtures', 'node_modules']))
+        self.assertEqual(
+            ['inner/b-spec.js'],
+            unittest_jasmine.discovery.find(
+                self.directory,
+                ['inner/*.js']))
+
+    def test_find_pruned(self):
+        """Tests that directories in which no pattern can match are not
+        searched"""
+        discovery = unittest_jasmine.discovery
+        with mock.patch.object(
+                discovery, '_list', wraps=discovery._list) as listing:
+            self.assertEqual(
+                ['a-spec.js', 'helper.js'],
+                discovery.find(self.directory, ['*']))
+            self.assertEqual(
+                [self.directory],
+                [c[0][0].rstrip(os.sep) for c in listing.call_args_list])
+
+            listing.reset_mock()
+            self.assertEqual(
+                ['inner/b-spec.js'],
+                discovery.find(self.directory, ['inner/*.js']))
+            self.assertEqual(2, listing.call_count)
+
+    def test_find_cached(self):
+        """Tests that listings are reused while directories are unchanged"""
+        past = time.time() - 60
+        for root, dirs, files in os.walk(self.directory):
+            os.utime(root, (past, past))
+        unittest_jasmine.discovery.find(self.directory)
+
+        # Add a file without updating the modification time
+        self.touch('inner/f-spec.js')
+        os.utime(os.path.join(self.directory, 'inner'), (past, past))
+        self.assertNotIn(
+            'inner/f-spec.js',
+            unittest_jasmine.discovery.find(self.directory))
+
+        # Add a file normally
+        self.touch('inner/g-spec.js')
+        self.assertIn(
+            'inner/g-spec.js',
+            unittest_jasmine.discovery.find(self.directory))
@@ -1,8 +1,13 @@
+import os
 import subprocess
 import unittest
 
+from unittest import mock
+
 import unittest_jasmine
 
+from . import _res as res
+
 
 class NodeTest(unittest.TestCase):
     def test_node_available(self):
@@ -17,3 +22,22 @@ class NodeTest(unittest.TestCase):
         self.assertEqual(
             'Hello World',
             stdout.strip().decode('ascii'))
+
+    def test_node_override(self):
+        """Tests that the command can be overridden using the environment"""
+        with mock.patch.dict(os.environ, {
+                unittest_jasmine.node.ENVIRONMENT_VARIABLE: '/custom/node'}):
+            self.assertEqual(
+                '/custom/node',
+                unittest_jasmine.node._locate_node())
+
+    def test_node_cached(self):
+        """Tests that the located command is cached"""
+        res.temporary_cache(self)
+        unittest_jasmine.node._locate_node()
+        self.assertEqual(
+            unittest_jasmine.node.BINARY,
+            unittest_jasmine.cache.load(
+                os.path.join(
+                    unittest_jasmine.cache.directory(), 'node.json'),
+                {}).get(unittest_jasmine.node._cache_key()))
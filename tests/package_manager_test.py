@@ -1,6 +1,11 @@
 import contextlib
+import os
+import shutil
+import tempfile
 import unittest
 
+from unittest import mock
+
 import unittest_jasmine
 
 
@@ -32,7 +37,7 @@ class Interceptor(object):
         """
         return self._CALL_COUNT > 0
 
-    def __init__(self):
+    def __init__(self, directory=None):
         if not self._COUNT:
             raise RuntimeError()
 
@@ -40,7 +45,54 @@ class Interceptor(object):
         Interceptor._CALL_COUNT += 1
 
 
+class CountingNPM(unittest_jasmine.package_manager.NPM):
+    """An npm manager that does not run npm, but counts installations.
+    """
+    def __init__(self, directory=None):
+        self.directory = os.path.abspath(directory or os.getcwd())
+        self.installations = 0
+
+    def _install(self):
+        self.installations += 1
+        if not os.path.isdir(self.path(self.MODULES_DIRECTORY)):
+            os.mkdir(self.path(self.MODULES_DIRECTORY))
+
+
+class FakeNPM(CountingNPM):
+    """An npm manager that installs a single package without running npm.
+    """
+    def _install(self):
+        super(FakeNPM, self)._install()
+        os.mkdir(self.path(self.MODULES_DIRECTORY, 'package'))
+        with open(self.path(
+                self.MODULES_DIRECTORY, 'package', 'index.js'), 'w') as f:
+            f.write('module.exports = 42;')
+
+
 class PackageManagerTest(unittest.TestCase):
+    @contextlib.contextmanager
+    def package_directory(self, cache=None):
+        """A context manager to run a code block in a temporary package
+        directory, with a temporary cache directory.
+
+        :param str cache: The cache directory to use instead of a temporary
+            one.
+        """
+        cwd = os.getcwd()
+        root = tempfile.mkdtemp()
+        try:
+            with mock.patch.dict(os.environ, {
+                    unittest_jasmine.cache.ENVIRONMENT_VARIABLE:
+                    cache or os.path.join(root, 'cache')}):
+                os.mkdir(os.path.join(root, 'package'))
+                os.chdir(os.path.join(root, 'package'))
+                with open('package.json', 'w') as f:
+                    f.write('{}')
+                yield
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(root)
+
     def test_install_dependencies(self):
         """Tests that a manager is called"""
         with Interceptor.active():
@@ -50,8 +102,130 @@ class PackageManagerTest(unittest.TestCase):
         self.assertTrue(
             Interceptor.was_called())
 
+    def test_installation(self):
+        """Tests that dependencies are installed in the background"""
+        with Interceptor.active():
+            installation = unittest_jasmine.package_manager.Installation()
+            self.assertIsInstance(installation.wait(), Interceptor)
+            self.assertTrue(installation.done)
+        self.assertTrue(
+            Interceptor.was_called())
+
+    def test_installation_directory(self):
+        """Tests that dependencies are installed in the directory that was
+        current when the installation was created"""
+        package_manager = unittest_jasmine.package_manager
+        with self.package_directory():
+            directory = os.getcwd()
+            with mock.patch.object(
+                    package_manager, 'install_dependencies') as install:
+                installation = package_manager.Installation()
+                os.chdir(os.pardir)
+                installation.wait()
+            install.assert_called_once_with(directory)
+
+            CountingNPM(directory).install_dependencies()
+            self.assertTrue(
+                os.path.isdir(os.path.join(directory, 'node_modules')))
+            self.assertFalse(os.path.isdir('node_modules'))
+
     def test_npm(self):
         """Tests that the npm manager works"""
         self.assertIsInstance(
             unittest_jasmine.package_manager.install_dependencies(),
             unittest_jasmine.package_manager.NPM)
+
+    def test_npm_stamp(self):
+        """Tests that npm is run only when dependencies have changed"""
+        with self.package_directory():
+            npm = CountingNPM()
+            npm.install_dependencies()
+            npm.install_dependencies()
+            self.assertEqual(1, npm.installations)
+
+            with open('package.json', 'w') as f:
+                f.write('{"name": "changed"}')
+            npm.install_dependencies()
+            npm.install_dependencies()
+            self.assertEqual(2, npm.installations)
+
+            os.mkdir(os.path.join('node_modules', 'removed'))
+            npm.install_dependencies()
+            self.assertEqual(3, npm.installations)
+
+    def test_version_missing(self):
+        """Tests that the version of a missing command is None"""
+        self.assertIsNone(
+            unittest_jasmine.package_manager.version('__no_such_command__'))
+
+    def test_version_cached(self):
+        """Tests that versions are cached by the executable run"""
+        package_manager = unittest_jasmine.package_manager
+        with self.package_directory(), mock.patch.dict(
+                package_manager._versions, clear=True):
+            version = package_manager.version('node')
+            self.assertEqual(
+                list(version),
+                unittest_jasmine.cache.load(
+                    os.path.join(
+                        unittest_jasmine.cache.directory(),
+                        'package-managers.json'),
+                    {}).get(unittest_jasmine.cache.command_key(['node'])))
+
+    def test_lock_file(self):
+        """Tests that the package manager is selected by the lock file"""
+        package_manager = unittest_jasmine.package_manager
+        previous = dict(package_manager._versions)
+        package_manager._versions.update(npm=(6, 0), yarn=(1, 0), pnpm=(8, 0))
+        try:
+            with self.package_directory():
+                package_manager.NPM()
+                for klass in (
+                        package_manager.NPMCI,
+                        package_manager.Yarn,
+                        package_manager.PNPM):
+                    with self.assertRaises(ValueError):
+                        klass()
+
+                for lock_file, klass, version in (
+                        ('package-lock.json', package_manager.NPMCI, (6, 0)),
+                        ('yarn.lock', package_manager.Yarn, (1, 0)),
+                        ('pnpm-lock.yaml', package_manager.PNPM, (8, 0))):
+                    with open(lock_file, 'w') as f:
+                        f.write('')
+                    self.assertEqual(version, klass().version)
+
+                package_manager._versions.update(npm=(5, 0))
+                with self.assertRaises(ValueError):
+                    package_manager.NPMCI()
+        finally:
+            package_manager._versions.clear()
+            package_manager._versions.update(previous)
+
+    def test_store(self):
+        """Tests that dependencies are installed from the store"""
+        package_manager = unittest_jasmine.package_manager
+        cache = tempfile.mkdtemp()
+        npm = FakeNPM()
+        try:
+            # Install in two package directories sharing the cache; an
+            # unrelated change to PATH does not invalidate the store
+            for path in (
+                    os.environ.get('PATH', ''),
+                    os.environ.get('PATH', '') + os.pathsep + cache):
+                with self.package_directory(cache), mock.patch.dict(
+                        os.environ, {
+                            'PATH': path,
+                            unittest_jasmine.store.ENVIRONMENT_VARIABLE: '1'}):
+                    with open('package-lock.json', 'w') as f:
+                        f.write('{}')
+                    store = package_manager.Store()
+                    store.delegate = npm
+                    npm.directory = store.directory
+                    store.install_dependencies()
+                    with open(os.path.join(
+                            'node_modules', 'package', 'index.js')) as f:
+                        self.assertEqual('module.exports = 42;', f.read())
+                    self.assertEqual(1, npm.installations)
+        finally:
+            shutil.rmtree(cache)
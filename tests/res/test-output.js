@@ -0,0 +1,8 @@
+describe("Output", function() {
+    console.log("Output while loading");
+
+    it("writes to stdout", function() {
+        console.log("Output from spec");
+        expect(1).toEqual(1);
+    });
+});
@@ -0,0 +1,17 @@
+// Every spec appends its description to the file named by the environment
+// variable UNITTEST_JASMINE_TEST_LOG when it is executed
+function log(description) {
+    require("fs").appendFileSync(
+        process.env.UNITTEST_JASMINE_TEST_LOG,
+        description + "\n");
+}
+
+describe("SideEffect", function() {
+    it("spec 1", function() {
+        log("spec 1");
+    });
+
+    it("spec 2", function() {
+        log("spec 2");
+    });
+});
@@ -0,0 +1,7 @@
+// The spec keeps node busy for 200 ms
+describe("Slow", function() {
+    it("spec", function() {
+        var end = Date.now() + 200;
+        while (Date.now() < end) {}
+    });
+});
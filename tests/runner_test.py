@@ -1,12 +1,18 @@
+import asyncio
 import os
+import shutil
+import tempfile
+import time
 import unittest
 
+from unittest import mock
+
 import unittest_jasmine
 
-from . import _res as res
+from . import CacheTestCase, _res as res
 
 
-class RunnerTest(unittest.TestCase):
+class RunnerTest(CacheTestCase):
     def __init__(self, *args, **kwargs):
         super(RunnerTest, self).__init__(*args, **kwargs)
         unittest_jasmine.package_manager.install_dependencies()
@@ -50,6 +56,12 @@ class RunnerTest(unittest.TestCase):
                 expected,
                 self.subdict(actual, expected))
 
+    def test_runner_output_time(self):
+        """Tests that the runner stamps the time on every event"""
+        output = list(res.output())
+        times = [e['time'] for e in output[1:]]
+        self.assertEqual(sorted(times), times)
+
     def test_runner_output_coffee_script(self):
         """Tests that the runner provides the expected output for a Coffee
         Script test suite"""
@@ -66,3 +78,427 @@ class RunnerTest(unittest.TestCase):
             self.assertEqual(
                 expected,
                 self.subdict(actual, expected))
+
+    def test_runner_output_workers(self):
+        """Tests that the runner provides the expected output when splitting
+        the spec files between several workers"""
+        output = list(unittest_jasmine.runner.jasmine(
+            os.path.dirname(__file__),
+            os.path.join('res', 'test-runner.js'),
+            os.path.join('res', 'test-runner.js'),
+            workers=2))
+        tree = dict(res.TEST_OUTPUT[0])
+        tree['children'] = tree['children'] * 2
+        expected_output = [tree] + list(res.TEST_OUTPUT[1:]) * 2
+
+        self.assertEqual(
+            len(expected_output),
+            len(output))
+
+        for actual, expected in zip(output, expected_output):
+            self.assertEqual(
+                expected,
+                self.subdict(actual, expected))
+
+        self.assertEqual(
+            ['0:', '1:'],
+            [c['id'][:2] for c in output[0]['children']])
+        self.assertTrue(all(
+            o['data']['id'].startswith('0:')
+            for o in output[1:len(res.TEST_OUTPUT)]))
+        self.assertTrue(all(
+            o['data']['id'].startswith('1:')
+            for o in output[len(res.TEST_OUTPUT):]))
+
+    def test_runner_output_pool(self):
+        """Tests that the runner provides the expected output for consecutive
+        runs served by a pool"""
+        with unittest_jasmine.runner.Pool() as pool:
+            for i in range(2):
+                output = list(pool.jasmine(
+                    os.path.dirname(__file__),
+                    os.path.join('res', 'test-runner.js')))
+                expected_output = list(res.TEST_OUTPUT)
+
+                self.assertEqual(
+                    len(expected_output),
+                    len(output))
+
+                for actual, expected in zip(output, expected_output):
+                    self.assertEqual(
+                        expected,
+                        self.subdict(actual, expected))
+
+    def test_runner_pool_abort(self):
+        """Tests that a pool process is not reused after an aborted run"""
+        with unittest_jasmine.runner.Pool() as pool:
+            output = pool.jasmine(
+                os.path.dirname(__file__),
+                os.path.join('res', 'test-runner.js'))
+            next(output)
+            output.close()
+
+            self.assertEqual(
+                len(res.TEST_OUTPUT),
+                len(list(pool.jasmine(
+                    os.path.dirname(__file__),
+                    os.path.join('res', 'test-runner.js')))))
+
+    def test_runner_pool_close_pipes(self):
+        """Tests that the pipes of dead and killed pool processes are
+        closed"""
+        with unittest_jasmine.runner.Pool() as pool:
+            dead, = pool._idle
+            dead.kill()
+            dead.wait()
+            output = pool.jasmine(
+                os.path.dirname(__file__),
+                os.path.join('res', 'test-runner.js'))
+            next(output)
+            self.assertTrue(dead.stdin.closed)
+            self.assertTrue(dead.channel.closed)
+            busy, = pool._workers
+
+        self.assertIsNotNone(busy.returncode)
+        self.assertTrue(busy.stdin.closed)
+        self.assertTrue(busy.channel.closed)
+        output.close()
+
+    def test_runner_output_async(self):
+        """Tests that the asynchronous runner provides the expected output for
+        concurrent runs"""
+        async def collect(**options):
+            return [
+                event
+                async for event in unittest_jasmine.runner.jasmine_async(
+                    os.path.dirname(__file__),
+                    os.path.join('res', 'test-runner.js'),
+                    **options)]
+
+        async def main():
+            return await asyncio.gather(collect(), collect())
+
+        expected_output = list(res.TEST_OUTPUT)
+        for output in asyncio.run(main()):
+            self.assertEqual(
+                len(expected_output),
+                len(output))
+
+            for actual, expected in zip(output, expected_output):
+                self.assertEqual(
+                    expected,
+                    self.subdict(actual, expected))
+
+    def test_runner_output_async_workers(self):
+        """Tests that the asynchronous runner merges the output of several
+        workers"""
+        async def main():
+            return [
+                event
+                async for event in unittest_jasmine.runner.jasmine_async(
+                    os.path.dirname(__file__),
+                    os.path.join('res', 'test-runner.js'),
+                    os.path.join('res', 'test-runner.js'),
+                    workers=2)]
+
+        output = asyncio.run(main())
+        self.assertEqual(
+            2 * len(res.TEST_OUTPUT) - 1,
+            len(output))
+        self.assertEqual(
+            ['0:', '1:'],
+            [c['id'][:2] for c in output[0]['children']])
+
+    def test_runner_async_invalid_options(self):
+        """Tests that the asynchronous runner rejects the options only
+        supported by the synchronous runner"""
+        async def main(**options):
+            async for event in unittest_jasmine.runner.jasmine_async(
+                    os.path.dirname(__file__),
+                    os.path.join('res', 'test-runner.js'),
+                    **options):
+                pass
+
+        for options in ({'pool': None}, {'pipeline': 4}):
+            with self.assertRaises(TypeError):
+                asyncio.run(main(**options))
+
+    def test_runner_output_stdout_channel(self):
+        """Tests that the runner provides the expected output when events are
+        written to stdout, as on Windows"""
+        async def collect():
+            return [
+                event
+                async for event in unittest_jasmine.runner.jasmine_async(
+                    os.path.dirname(__file__),
+                    os.path.join('res', 'test-runner.js'))]
+
+        with mock.patch.object(
+                unittest_jasmine._runner, 'SEPARATE_CHANNEL', False):
+            with unittest_jasmine.runner.Pool() as pool:
+                outputs = [
+                    list(res.output()),
+                    list(pool.jasmine(
+                        os.path.dirname(__file__),
+                        os.path.join('res', 'test-runner.js'))),
+                    asyncio.run(collect())]
+            captured = list(res.output(path='test-output.js'))
+
+        expected_output = list(res.TEST_OUTPUT)
+        for output in outputs:
+            self.assertEqual(
+                len(expected_output),
+                len(output))
+
+            for actual, expected in zip(output, expected_output):
+                self.assertEqual(
+                    expected,
+                    self.subdict(actual, expected))
+
+        self.assertEqual(
+            'Output from spec\n',
+            captured[3]['data']['output'])
+
+    def test_runner_output_pipeline(self):
+        """Tests that the runner provides the expected output when reading
+        events ahead of a slow consumer"""
+        events = unittest_jasmine.runner.jasmine(
+            os.path.dirname(__file__),
+            os.path.join('res', 'test-runner.js'),
+            pipeline=4)
+        output = []
+        for event in events:
+            time.sleep(0.01)
+            output.append(event)
+        expected_output = list(res.TEST_OUTPUT)
+
+        self.assertEqual(
+            len(expected_output),
+            len(output))
+
+        for actual, expected in zip(output, expected_output):
+            self.assertEqual(
+                expected,
+                self.subdict(actual, expected))
+
+        self.assertLessEqual(events.max_depth, 4)
+        self.assertEqual(0, events.depth)
+
+    def test_runner_output_captured(self):
+        """Tests that output from specs does not corrupt the event stream, and
+        that it is attached to the spec result"""
+        output = list(res.output(path='test-output.js'))
+
+        self.assertEqual(
+            ['suiteStarted', 'specStarted', 'specDone', 'suiteDone'],
+            [o['event'] for o in output[1:]])
+        self.assertEqual(
+            'Output from spec\n',
+            output[3]['data']['output'])
+
+    def test_runner_output_stream(self):
+        """Tests that the runner announces the children of suites when they
+        are started when streaming the test tree"""
+        output = list(res.output(stream=True))
+        expected_output = list(res.TEST_OUTPUT)
+
+        self.assertEqual(
+            len(expected_output),
+            len(output))
+
+        self.assertEqual(
+            [{'description': 'TestRunner', 'type': 'suite'}],
+            [
+                self.subdict(c, {'description': None, 'type': None})
+                for c in output[0]['children']])
+        self.assertNotIn('children', output[0]['children'][0])
+        self.assertEqual(
+            ['spec 1', 'inner suite', 'spec 2'],
+            [c['description'] for c in output[1]['data']['children']])
+        self.assertNotIn('children', output[1]['data']['children'][1])
+        self.assertEqual(
+            ['inner spec 1', 'inner spec 2'],
+            [c['description'] for c in output[4]['data']['children']])
+
+    def test_runner_output_filter(self):
+        """Tests that the runner runs only the specs matching a filter"""
+        output = list(res.output(filter='^TestRunner inner suite '))
+        expected_output = [
+            {'type': 'suite', 'children': [
+                {'description': 'TestRunner', 'type': 'suite', 'children': [
+                    {'description': 'inner suite', 'type': 'suite',
+                        'children': [
+                            {'description': 'inner spec 1', 'type': 'spec'},
+                            {'description': 'inner spec 2', 'type': 'spec'}]},
+                ]}]}] + [
+            res.TEST_OUTPUT[i]
+            for i in (1, 4, 5, 6, 7, 8, 9, 12)]
+
+        self.assertEqual(
+            len(expected_output),
+            len(output))
+
+        for actual, expected in zip(output, expected_output):
+            self.assertEqual(
+                expected,
+                self.subdict(actual, expected))
+
+    def test_runner_output_filter_ids(self):
+        """Tests that the runner runs only the items with IDs in a filter"""
+        tree = next(res.output())
+        suite = tree['children'][0]
+        output = list(res.output(filter={'ids': [
+            suite['children'][0]['id'],
+            suite['children'][1]['id']]}))
+
+        self.assertEqual(
+            ['spec 1', 'inner suite'],
+            [c['description'] for c in output[0]['children'][0]['children']])
+        self.assertEqual(
+            ['spec 1', 'inner spec 1', 'inner spec 2'],
+            [
+                e['data']['description']
+                for e in output[1:]
+                if e['event'] == 'specDone'])
+
+    def test_runner_output_filter_locations(self):
+        """Tests that the runner runs only the items at locations in a
+        filter"""
+        def run(*locations, **filter):
+            filter['locations'] = [
+                os.path.join('res', 'test-runner.js') + ':%d' % line
+                for line in locations]
+            return [
+                e['data']['description']
+                for e in res.output(filter=filter)
+                if isinstance(e, dict) and e.get('event') == 'specDone']
+
+        self.assertEqual(
+            ['inner spec 1', 'inner spec 2'],
+            run(10))
+        self.assertEqual(
+            ['inner spec 2', 'spec 2'],
+            run(17, 21))
+        self.assertEqual(
+            ['inner spec 2'],
+            run(10, pattern='2$'))
+        self.assertEqual(
+            [],
+            run(20, pattern='inner'))
+
+    def test_runner_compile_cache(self):
+        """Tests that CoffeeScript files are compiled only when changed"""
+        root = self.cache_root
+
+        # The compiler is a stub counting its invocations, and replacing the
+        # stack trace formatting like the real compiler does
+        compiler = os.path.join(root, 'node_modules', 'coffee-script')
+        os.makedirs(compiler)
+        with open(os.path.join(compiler, 'package.json'), 'w') as f:
+            f.write('{"version": "0.0.0", "main": "index.js"}')
+        with open(os.path.join(compiler, 'index.js'), 'w') as f:
+            f.write(
+                'Error.prepareStackTrace = function() {\n'
+                '    return "mapped by the compiler";\n'
+                '};\n'
+                'exports.compile = function(source) {\n'
+                '    require("fs").appendFileSync(__dirname + "/count",'
+                ' "x");\n'
+                '    return {js: source, v3SourceMap: JSON.stringify({\n'
+                '        version: 3,\n'
+                '        sources: [""],\n'
+                '        mappings: "AAAA;AACC"\n'
+                '    })};\n'
+                '};\n')
+
+        spec = os.path.join(root, 'test-spec.coffee')
+        with open(os.path.join(
+                os.path.dirname(res.__file__),
+                'res',
+                'test-runner.js')) as f:
+            source = f.read()
+
+        stacks = []
+
+        def run(**options):
+            with open(spec, 'w') as f:
+                f.write(source)
+            events = list(unittest_jasmine.runner.jasmine(
+                root, 'test-spec.coffee', **options))
+            stacks[:] = [
+                failure['stack']
+                for event in events
+                if event.get('event') == 'specDone'
+                for failure in event['data']['failedExpectations']]
+            with open(os.path.join(compiler, 'count')) as f:
+                return len(events), len(f.read())
+
+        self.assertEqual((13, 1), run())
+
+        # The stack trace formatting of the compiler is not used, since the
+        # frames are mapped using the stored source map
+        self.assertTrue(stacks)
+        self.assertNotIn('mapped by the compiler', stacks)
+        self.assertEqual((13, 1), run())
+        source += '\n'
+        self.assertEqual((13, 2), run())
+
+        # The source map is stored with the compiled code
+        self.assertEqual(
+            (spec, 2, 2),
+            unittest_jasmine.sourcemap.lookup(spec, 2, 1))
+
+        # A compiler registered by a helper is not replaced
+        with open(os.path.join(root, 'helper.js'), 'w') as f:
+            f.write(
+                'require.extensions[".coffee"] = require.extensions[".js"];')
+        source += '\n'
+        self.assertEqual((13, 2), run(helpers=['helper.js']))
+
+    def test_runner_large_request(self):
+        """Tests that requests larger than the maximum command line argument
+        are passed to the runner"""
+        pattern = '|'.join('^no spec %d$' % i for i in range(20000))
+        output = list(res.output(filter=pattern + '|^TestRunner spec 2$'))
+
+        self.assertEqual(
+            ['spec 2'],
+            [
+                e['data']['description']
+                for e in output[1:]
+                if e['event'] == 'specDone'])
+
+    def test_runner_filter_ids_workers(self):
+        """Tests that filtering by ID is rejected for more than one worker"""
+        with self.assertRaises(ValueError):
+            list(res.output(filter={'ids': ['spec0']}, workers=2))
+
+    def test_runner_filter_not_executed(self):
+        """Tests that the specs not selected by a filter are never executed"""
+        root = tempfile.mkdtemp()
+        try:
+            log = os.path.join(root, 'log')
+            with mock.patch.dict(
+                    os.environ, {'UNITTEST_JASMINE_TEST_LOG': log}):
+                list(res.output(
+                    path='test-side-effect.js',
+                    filter='spec 2$'))
+            with open(log) as f:
+                self.assertEqual(['spec 2'], f.read().splitlines())
+
+        finally:
+            shutil.rmtree(root)
+
+    def test_runner_output_filter_stream(self):
+        """Tests that the runner announces only the children matching a
+        filter when streaming the test tree"""
+        output = list(res.output(
+            filter='^TestRunner spec 2$',
+            stream=True))
+
+        self.assertEqual(
+            ['suiteStarted', 'specStarted', 'specDone', 'suiteDone'],
+            [e['event'] for e in output[1:]])
+        self.assertEqual(
+            ['spec 2'],
+            [c['description'] for c in output[1]['data']['children']])
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import unittest_jasmine
+
+from . import CacheTestCase, _res as res
+
+
+class SchedulerTest(CacheTestCase):
+    def setUp(self):
+        super(SchedulerTest, self).setUp()
+        self.spec_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.spec_dir)
+
+    def write(self, name, size):
+        """Writes a spec file of a specific size to the spec directory.
+        """
+        with open(os.path.join(self.spec_dir, name), 'w') as f:
+            f.write(' ' * size)
+
+    def test_schedule(self):
+        """Tests that the longest spec files are spread between workers"""
+        self.assertEqual(
+            [['a', 'd'], ['b', 'c']],
+            unittest_jasmine.scheduler.schedule(
+                ['a', 'b', 'c', 'd'],
+                2,
+                {'a': 10.0, 'b': 6.0, 'c': 5.0, 'd': 1.0}))
+
+    def test_schedule_few_files(self):
+        """Tests that no empty shards are generated"""
+        self.assertEqual(
+            [['a']],
+            unittest_jasmine.scheduler.schedule(['a'], 4, {}))
+
+    def test_estimate_without_history(self):
+        """Tests that file sizes are used when no durations are recorded"""
+        self.write('a', 100)
+        self.write('b', 200)
+        timings = unittest_jasmine.scheduler.Timings(self.spec_dir)
+        self.assertEqual(
+            {'a': 100.0, 'b': 200.0},
+            timings.estimate(['a', 'b']))
+
+    def test_estimate_with_history(self):
+        """Tests that file sizes are scaled using recorded durations"""
+        self.write('a', 100)
+        self.write('b', 200)
+        timings = unittest_jasmine.scheduler.Timings(self.spec_dir)
+        timings.files['a'] = 2.0
+        self.assertEqual(
+            {'a': 2.0, 'b': 4.0},
+            timings.estimate(['a', 'b']))
+
+    def test_record(self):
+        """Tests that durations are recorded from a test run"""
+        path = os.path.join('res', 'test-runner.js')
+        list(res.output())
+        timings = unittest_jasmine.scheduler.Timings(
+            os.path.dirname(res.__file__))
+        self.assertIn(path, timings.files)
+        self.assertIn('TestRunner spec 1', timings.specs)
+
+    def test_schedule_without_durations(self):
+        """Tests that files without duration are spread between workers"""
+        self.assertEqual(
+            [['a', 'c'], ['b']],
+            unittest_jasmine.scheduler.schedule(
+                ['a', 'b', 'c'],
+                2,
+                {'a': 0.0, 'b': 0.0, 'c': 0.0}))
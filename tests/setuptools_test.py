@@ -0,0 +1,79 @@
+import os
+import re
+import unittest
+
+from unittest import mock
+
+import unittest_jasmine
+
+from . import _res as res
+
+
+class SetuptoolsLoaderTest(unittest.TestCase):
+    def test_filter(self):
+        """Tests that unittest name patterns are translated to a regular
+        expression"""
+        loader = unittest_jasmine.SetuptoolsLoader()
+        self.assertIsNone(loader._filter())
+
+        loader.testNamePatterns = ['*inner spec*', 'a.b?']
+        filter = re.compile(loader._filter())
+        self.assertTrue(filter.match('TestRunner inner spec 1'))
+        self.assertTrue(filter.match('a.bc'))
+        self.assertFalse(filter.match('axbc'))
+        self.assertFalse(filter.match('TestRunner spec 1'))
+
+        loader.testNamePatterns = ['spec [1-2]', 'spec [!1-2]x', 'a[]]', 'b[c']
+        filter = re.compile(loader._filter())
+        self.assertTrue(filter.match('spec 2'))
+        self.assertFalse(filter.match('spec 3'))
+        self.assertTrue(filter.match('spec 3x'))
+        self.assertFalse(filter.match('spec 1x'))
+        self.assertTrue(filter.match('a]'))
+        self.assertTrue(filter.match('b[c'))
+
+    def test_guess_test_directory(self):
+        """Tests that the test directory is guessed from the module"""
+        loader = unittest_jasmine.SetuptoolsLoader()
+        self.assertEqual(
+            unittest_jasmine.__path__[0],
+            loader._guess_test_directory('unittest_jasmine'))
+        self.assertIsNone(
+            loader._guess_test_directory('__no_such_module__'))
+
+    def test_spec_files(self):
+        """Tests that subdirectories are searched only when include is
+        passed"""
+        root = res.temporary_cache(self)
+        directory = os.path.join(root, 'spec')
+        for path in ('a-spec.js', 'helper.js', 'inner/b-spec.js'):
+            path = os.path.join(directory, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w'):
+                pass
+
+        loader = unittest_jasmine.SetuptoolsLoader()
+        spec_regex = re.compile(r'.*?spec\.js')
+        self.assertEqual(
+            ['a-spec.js'],
+            loader._spec_files(directory, spec_regex, None, None))
+        self.assertEqual(
+            ['a-spec.js', 'inner/b-spec.js'],
+            loader._spec_files(directory, spec_regex, ['**/*-spec.js'], None))
+
+    def test_installation_lazy(self):
+        """Tests that dependencies are installed only when a test directory is
+        found"""
+        with mock.patch.object(
+                unittest_jasmine.package_manager,
+                'Installation') as installation:
+            loader = unittest_jasmine.SetuptoolsLoader()
+            with mock.patch.object(
+                    loader, '_guess_test_directory', return_value=None):
+                loader.loadTestsFromNames([__name__])
+            self.assertFalse(installation.called)
+
+            unittest_jasmine.SetuptoolsLoader().loadTestsFromNames([
+                __name__ + '|test_directory=' + os.path.dirname(__file__)])
+            self.assertEqual(1, installation.call_count)
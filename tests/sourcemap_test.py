@@ -0,0 +1,107 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import traceback
+import unittest
+
+import unittest_jasmine
+
+
+class SourceMapTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(
+            os.path.dirname(__file__), 'res', 'test-runner.js')
+
+        # Generated line 1 maps to source line 5, column 9, and generated line
+        # 2 to source line 7, column 9
+        self.data = {
+            'version': 3,
+            'sources': [os.path.relpath(self.source, self.root)],
+            'mappings': 'AAIQ;AAEA'}
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def generated(self, name, comment=''):
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as f:
+            f.write('a();\nb();\n' + comment)
+        return path
+
+    def test_decode(self):
+        """Asserts that VLQ values are decoded"""
+        self.assertEqual(
+            [0, 0, 0, 0],
+            unittest_jasmine.sourcemap.decode('AAAA'))
+        self.assertEqual(
+            [16, -1, 1, 1000],
+            unittest_jasmine.sourcemap.decode('gBDCw+B'))
+        with self.assertRaises(ValueError):
+            unittest_jasmine.sourcemap.decode('g')
+
+    def test_lookup(self):
+        """Asserts that locations are mapped by the closest segment"""
+        source_map = unittest_jasmine.sourcemap.SourceMap({
+            'sources': ['a.coffee', 'b.coffee'],
+            'mappings': 'AAAA,IAAI,ICAA;;AAAA'}, '/base')
+        self.assertEqual(
+            ('/base/a.coffee', 1, 1),
+            source_map.lookup(1, 1))
+        self.assertEqual(
+            ('/base/a.coffee', 1, 5),
+            source_map.lookup(1, 8))
+        self.assertEqual(
+            ('/base/b.coffee', 1, 5),
+            source_map.lookup(1, 20))
+        self.assertIsNone(source_map.lookup(2, 1))
+        self.assertIsNone(source_map.lookup(5, 1))
+
+    def test_inline(self):
+        """Asserts that inline source maps are used"""
+        path = self.generated(
+            'inline.js',
+            '//# sourceMappingURL=data:application/json;base64,%s\n' % (
+                base64.b64encode(json.dumps(self.data).encode('utf-8'))
+                .decode('ascii')))
+        self.assertEqual(
+            (self.source, 7, 9),
+            unittest_jasmine.sourcemap.lookup(path, 2, 1))
+
+    def test_sidecar(self):
+        """Asserts that source maps next to the file are used"""
+        path = self.generated('sidecar.js')
+        with open(path + '.map', 'w') as f:
+            json.dump(self.data, f)
+        self.assertEqual(
+            (self.source, 5, 9),
+            unittest_jasmine.sourcemap.lookup(path, 1, 1))
+        self.assertIs(
+            unittest_jasmine.sourcemap.load(path),
+            unittest_jasmine.sourcemap.load(path))
+
+    def test_missing(self):
+        """Asserts that files without source maps are not mapped"""
+        self.assertIsNone(unittest_jasmine.sourcemap.lookup(
+            self.generated('missing.js'), 1, 1))
+
+    def test_tb(self):
+        """Asserts that tracebacks are mapped to the sources"""
+        path = self.generated('tb.js', '//# sourceMappingURL=tb.js.map\n')
+        with open(path + '.map', 'w') as f:
+            json.dump(self.data, f)
+
+        tb = unittest_jasmine.tb.Traceback.from_stack("""
+            Error: Expected 2 to equal 1.
+                at func ({0}:1:1)
+                at Object.<anonymous> ({0}:2:1)""".format(path))
+        expected = ' '.join("""
+            File "{0}", line 7, in Object.<anonymous>
+                func();
+            File "{0}", line 5, in func
+                expect(2).toEqual(1);""".format(self.source).split())
+        self.assertEqual(
+            expected,
+            ' '.join(' '.join(traceback.format_tb(tb)).split()))
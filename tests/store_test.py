@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+import unittest_jasmine
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        environment = mock.patch.dict(os.environ, {
+            unittest_jasmine.cache.ENVIRONMENT_VARIABLE: os.path.join(
+                self.root, 'cache'),
+            unittest_jasmine.store.ENVIRONMENT_VARIABLE: '1'})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+    def tree(self, name):
+        """Creates a directory tree with a file, an executable file, a
+        directory and a symbolic link.
+
+        :param str name: The name of the tree, relative to the temporary
+            directory.
+
+        :return: the path of the tree
+        """
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.join(path, 'package', '.bin'))
+        with open(os.path.join(path, 'package', 'index.js'), 'w') as f:
+            f.write('module.exports = 42;')
+        with open(os.path.join(path, 'package', 'cli.js'), 'w') as f:
+            f.write('#!/usr/bin/env node')
+        os.chmod(os.path.join(path, 'package', 'cli.js'), 0o755)
+        os.symlink(
+            os.path.join('..', 'cli.js'),
+            os.path.join(path, 'package', '.bin', 'cli'))
+        return path
+
+    def test_enabled(self):
+        """Tests that the store is enabled by the environment"""
+        self.assertTrue(unittest_jasmine.store.enabled())
+        os.environ[unittest_jasmine.store.ENVIRONMENT_VARIABLE] = '0'
+        self.assertFalse(unittest_jasmine.store.enabled())
+
+    def test_materialize(self):
+        """Tests that a stored tree is materialised with shared files"""
+        source = self.tree('source')
+        self.assertFalse(unittest_jasmine.store.contains('key'))
+        unittest_jasmine.store.ingest(source, 'key')
+        self.assertTrue(unittest_jasmine.store.contains('key'))
+
+        target = os.path.join(self.root, 'target')
+        unittest_jasmine.store.materialize(target, 'key')
+        other = os.path.join(self.root, 'other')
+        unittest_jasmine.store.materialize(other, 'key')
+        for name in ('index.js', 'cli.js'):
+            self.assertFalse(os.path.samefile(
+                os.path.join(source, 'package', name),
+                os.path.join(target, 'package', name)))
+            self.assertTrue(os.path.samefile(
+                os.path.join(other, 'package', name),
+                os.path.join(target, 'package', name)))
+        self.assertTrue(os.access(
+            os.path.join(target, 'package', 'cli.js'), os.X_OK))
+        self.assertEqual(
+            os.path.join('..', 'cli.js'),
+            os.readlink(os.path.join(target, 'package', '.bin', 'cli')))
+
+    def test_ingest_copies(self):
+        """Tests that modifying an added tree does not modify the store"""
+        source = self.tree('source')
+        unittest_jasmine.store.ingest(source, 'key')
+        with open(os.path.join(source, 'package', 'index.js'), 'w') as f:
+            f.write('module.exports = 0;')
+
+        target = os.path.join(self.root, 'target')
+        unittest_jasmine.store.materialize(target, 'key')
+        with open(os.path.join(target, 'package', 'index.js')) as f:
+            self.assertEqual('module.exports = 42;', f.read())
+
+    def test_materialize_missing(self):
+        """Tests that materialising a missing tree raises KeyError"""
+        with self.assertRaises(KeyError):
+            unittest_jasmine.store.materialize(
+                os.path.join(self.root, 'target'), 'key')
@@ -1,4 +1,7 @@
+import linecache
 import os
+import shutil
+import tempfile
 import traceback
 import unittest
 
@@ -26,3 +29,83 @@ class TracebackTest(unittest.TestCase):
         self.assertEqual(
             expected,
             ' '.join(' '.join(traceback.format_tb(tb)).split()))
+
+    def test_tb_source(self):
+        """Asserts that source files are read only when a traceback is
+        formatted, and read again when changed"""
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, 'test.js')
+            with open(path, 'w') as f:
+                f.write('first();\n')
+            stack = 'Error\n    at Object.<anonymous> ({0}:1:1)'.format(path)
+
+            tb = unittest_jasmine.tb.Traceback.from_stack(stack)
+            self.assertNotIn(path, linecache.cache)
+            self.assertIn('first();', ''.join(traceback.format_tb(tb)))
+            self.assertIn(path, linecache.cache)
+
+            with open(path, 'w') as f:
+                f.write('second();\n')
+            os.utime(path, (0, 0))
+            self.assertIn('second();', ''.join(traceback.format_tb(tb)))
+
+        finally:
+            shutil.rmtree(root)
+            linecache.checkcache(path)
+
+    def test_tb_shared(self):
+        """Asserts that frames are shared between tracebacks and that the
+        chain is linked"""
+        stack = """
+            Error: Expected 2 to equal 1.
+                at func (test.js:5:23)
+                at Object.<anonymous> (test.js:7:9)"""
+        tb1 = unittest_jasmine.tb.Traceback.from_stack(stack)
+        tb2 = unittest_jasmine.tb.Traceback.from_stack(stack)
+
+        self.assertIsNot(tb1, tb2)
+        self.assertIs(tb1.tb_frame, tb2.tb_frame)
+        self.assertIs(tb1.tb_next.tb_frame, tb2.tb_next.tb_frame)
+        self.assertEqual(
+            [('Object.<anonymous>', 7), ('func', 5)],
+            [(tb1.tb_frame.f_code.co_name, tb1.tb_lineno), (
+                tb1.tb_next.tb_frame.f_code.co_name, tb1.tb_next.tb_lineno)])
+        self.assertIsNone(tb1.tb_next.tb_next)
+
+        tb1.tb_next = None
+        self.assertIsNotNone(tb2.tb_next)
+
+    def test_tb_result(self):
+        """Asserts that a traceback can be added to a test result"""
+        class Test(unittest.TestCase):
+            def runTest(self):
+                pass
+
+        test = Test()
+        result = unittest.TestResult()
+        result.addFailure(test, (
+            AssertionError,
+            AssertionError('message'),
+            unittest_jasmine.tb.Traceback.from_stack(
+                'Error\n    at func (test.js:5:23)')))
+        self.assertIn('test.js', result.failures[0][1])
+
+    def test_tb_lazy(self):
+        """Asserts that a lazy traceback parses the stack only when
+        inspected"""
+        stack = """
+            Error: Expected 2 to equal 1.
+                at func (test.js:5:23)
+                at Object.<anonymous> (test.js:7:9)"""
+        tb = unittest_jasmine.tb.LazyTraceback(stack)
+        self.assertEqual(stack, tb._stack)
+        self.assertEqual(
+            traceback.format_tb(
+                unittest_jasmine.tb.Traceback.from_stack(stack)),
+            traceback.format_tb(tb))
+        self.assertIsNone(tb._stack)
+
+        empty = unittest_jasmine.tb.LazyTraceback('')
+        self.assertEqual(0, empty.tb_lineno)
+        self.assertIsNone(empty.tb_next)
@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import unittest_jasmine
+
+from . import CacheTestCase, _res as res
+
+
+class TimingTest(CacheTestCase):
+    def run_profiled(self, profile, path='test-runner.js'):
+        """Runs a test resource with a profile.
+
+        :param unittest_jasmine.timing.Profile profile: The profile.
+
+        :param str path: The name of the test resource.
+        """
+        output = res.output(path)
+        tree = unittest_jasmine.data.parse(
+            next(output),
+            spec=unittest_jasmine.unittest.Test,
+            suite=unittest_jasmine.unittest.Suite)
+        tree.jasmine = output
+        tree.profile = profile
+        tree.run(unittest.TestResult())
+
+    def test_profile(self):
+        """Asserts that the times of all items are recorded"""
+        profile = unittest_jasmine.timing.Profile()
+        self.run_profiled(profile)
+        report = profile.report()
+
+        self.assertEqual(
+            {
+                'TestRunner spec 1',
+                'TestRunner spec 2',
+                'TestRunner inner suite inner spec 1',
+                'TestRunner inner suite inner spec 2'},
+            set(e['name'] for e in report['specs']))
+        self.assertEqual(
+            {'TestRunner', 'TestRunner inner suite'},
+            set(e['name'] for e in report['suites']))
+        for entry in report['specs'] + report['suites']:
+            self.assertIsNotNone(entry['node'])
+            self.assertEqual(
+                set(unittest_jasmine.timing.CATEGORIES),
+                set(entry['python']))
+            self.assertAlmostEqual(
+                entry['total'],
+                entry['node'] + sum(entry['python'].values()))
+        self.assertEqual(
+            sorted((e['total'] for e in report['specs']), reverse=True),
+            [e['total'] for e in report['specs']])
+
+    def test_total(self):
+        """Asserts that the time spent waiting for node is not counted as time
+        spent in Python"""
+        profile = unittest_jasmine.timing.Profile()
+        start = time.perf_counter()
+        self.run_profiled(profile, 'test-slow.js')
+        wall = time.perf_counter() - start
+        spec, = profile.report()['specs']
+
+        self.assertGreaterEqual(spec['node'], 0.2)
+        self.assertLess(sum(spec['python'].values()), 0.05)
+        self.assertLessEqual(spec['total'], wall)
+
+    def test_complete(self):
+        """Asserts that the report is written when the run has completed"""
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, 'report.json')
+            profile = unittest_jasmine.timing.Profile(path)
+            self.run_profiled(profile)
+            with open(path) as f:
+                self.assertEqual(4, len(json.load(f)['specs']))
+
+        finally:
+            shutil.rmtree(root)
+
+    def test_table(self):
+        """Asserts that the table lists at most the requested number of items
+        """
+        profile = unittest_jasmine.timing.Profile()
+        self.run_profiled(profile)
+        lines = profile.table(1).splitlines()
+        self.assertEqual(
+            ['Slowest specs:', 'Slowest suites:'],
+            [l for l in lines if l.startswith('Slowest')])
+        self.assertEqual(6, len([l for l in lines if l]))
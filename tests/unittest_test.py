@@ -0,0 +1,86 @@
+import unittest
+
+import unittest_jasmine
+
+from . import CacheTestCase, _res as res
+
+
+class UnittestTest(CacheTestCase):
+    def tree(self):
+        return unittest_jasmine.data.parse(
+            res.SUITE_DEFINITION,
+            spec=unittest_jasmine.unittest.Test,
+            suite=unittest_jasmine.unittest.Suite)
+
+    def test_str(self):
+        """Asserts that items are named by their dotted IDs"""
+        tree = self.tree()
+        self.assertEqual('', str(tree))
+        self.assertEqual('suite1', str(tree.children[0]))
+        self.assertEqual('suite1.spec1', str(tree.children[0].children[1]))
+        self.assertEqual('spec2', str(tree.children[1]))
+
+    def test_topsuite(self):
+        """Asserts that all items find the top level suite"""
+        tree = self.tree()
+        self.assertIs(tree, tree.topsuite)
+        self.assertIs(tree, tree.children[0].topsuite)
+        self.assertIs(tree, tree.children[0].children[1].topsuite)
+
+    def test_jasmine(self):
+        """Asserts that the runner is shared by all items"""
+        tree = self.tree()
+        spec = tree.children[0].children[0]
+        self.assertIsNone(spec.jasmine)
+        tree.jasmine = iter([])
+        self.assertIs(tree.jasmine, spec.jasmine)
+
+    def test_announce(self):
+        """Asserts that announced items are linked to the tree"""
+        tree = unittest_jasmine.data.parse(
+            next(res.output(stream=True)),
+            spec=unittest_jasmine.unittest.Test,
+            suite=unittest_jasmine.unittest.Suite)
+        suite = tree.children[0]
+        self.assertEqual([], list(suite))
+
+        items = next(res.output())['children'][0]['children']
+        children = suite.announce(items)
+        self.assertEqual(children, list(suite))
+        self.assertIs(tree, children[0].topsuite)
+        self.assertEqual(
+            '%s.%s' % (suite.id, children[0].id),
+            str(children[0]))
+
+    def test_deferred(self):
+        """Asserts that deferred suites are loaded when run"""
+        loaded = []
+
+        def load():
+            loaded.append(True)
+            return unittest.FunctionTestCase(lambda: None)
+
+        suite = unittest_jasmine.unittest.DeferredSuite(load)
+        self.assertEqual([], loaded)
+        self.assertEqual(['jasmine'], [str(t) for t in suite])
+        self.assertEqual(1, suite.countTestCases())
+
+        result = unittest.TestResult()
+        suite.run(result)
+        self.assertEqual([True], loaded)
+        self.assertEqual(1, result.testsRun)
+
+    def test_deferred_error(self):
+        """Asserts that failing to load a deferred suite is reported as an
+        error"""
+        def load():
+            return next(iter([]))
+
+        suite = unittest_jasmine.unittest.DeferredSuite(load)
+        result = unittest.TestResult()
+        suite.run(result)
+        self.assertEqual(1, result.testsRun)
+        self.assertEqual(
+            ['jasmine'],
+            [str(test) for test, traceback in result.errors])
+        self.assertIn('StopIteration', result.errors[0][1])